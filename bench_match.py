@@ -333,5 +333,75 @@ def bench_if_float_or_int():
 
 ###
 
+# Scaling with the sequence length
+
+@micro_benchmark.configure(params={'n': [1, 10, 100, 1000]})
+def bench_match_list_star_capvars():
+
+    # Init
+    obj = list(range(n + 2))
+
+    # Bench
+    match obj:
+        case [a, b, *rest]:
+            pass
+        case _:
+            pass
+
+@micro_benchmark.configure(params={'n': [1, 10, 100, 1000]})
+def bench_if_list_star_capvars():
+
+    # Init
+    obj = list(range(n + 2))
+
+    # Bench
+    if isinstance(obj, list) and len(obj) >= 2:
+        a, b, *rest = obj
+    else:
+        pass
+
+###
+
+# Polymorphic input: rotate through a corpus of differently shaped inputs
+
+@micro_benchmark.configure(rotate='obj', mix=[6, 2, 1, 1])
+def bench_match_mixed():
+
+    # Init
+    corpus = [1, 2.5, [1, 2, 3], {'abc': 1}]
+
+    # Bench
+    match obj:
+        case int():
+            pass
+        case float():
+            pass
+        case [a, b, c]:
+            pass
+        case {'abc': value}:
+            pass
+        case _:
+            pass
+
+@micro_benchmark.configure(rotate='obj', mix=[6, 2, 1, 1])
+def bench_if_mixed():
+
+    # Init
+    corpus = [1, 2.5, [1, 2, 3], {'abc': 1}]
+
+    # Bench
+    if isinstance(obj, int):
+        pass
+    elif isinstance(obj, float):
+        pass
+    elif isinstance(obj, list) and len(obj) == 3:
+        a, b, c = obj
+    elif isinstance(obj, dict) and 'abc' in obj:
+        value = obj['abc']
+    else:
+        pass
+
+###
+
 if __name__ == '__main__':
     runner = micro_benchmark.run(globals())
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+    End-to-end throughput benchmarks for the match based parsers
+
+    Generates synthetic data using synthetic_data.py and runs the parsers
+    from match_xml, match_json and match_geojson on it, together with
+    if-elif-else baseline implementations, reporting records/s, MB/s and
+    the peak memory use. The "xml-engine" benchmark compares the
+    ElementTree and expat engines of match_xml.
+
+    Use: bench_parsers.py [--size SIZE ...] [--invalid SHARE] [--seed SEED]
+                          [--formats FORMAT ...] [--repeat N]
+                          [--data-dir DIR] [--no-memory]
+
+    The "xml" benchmark and the expat engine process the data
+    incrementally. The ElementTree engine builds the complete tree,
+    which needs several times the file size in memory.
+
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from xml.etree.ElementTree import iterparse, parse
+
+import synthetic_data
+from match_xml import (parse_countries_1, parse_countries_2,
+                       parse_countries_expat, error_string)
+from match_json import parse_demo_record
+from match_geojson import GEOJSON_TYPES, parse_geojson_record
+
+### Globals
+
+# Default data sizes, share of invalid records and number of timed runs
+DEFAULT_SIZES = ('1MB',)
+DEFAULT_INVALID = 0.05
+DEFAULT_REPEAT = 3
+
+# Default directory for the generated data files
+DEFAULT_DATA_DIR = 'mb-data'
+
+### if-elif-else baselines
+
+def parse_countries_if(tree):
+
+    """ if-elif-else version of match_xml.parse_countries_2().
+
+    """
+    countries = {}
+    for country in tree:
+        if country.tag != 'country' or 'name' not in country.attrib:
+            raise TypeError(error_string(country, 'country'))
+        name = country.attrib['name']
+        children = list(country)
+        if (len(children) < 3 or
+            children[0].tag != 'rank' or
+            children[1].tag != 'year' or
+            children[2].tag != 'gdppc'):
+            raise TypeError(error_string(country, 'country elements'))
+        # Convert types
+        rank = int(children[0].text)
+        year = int(children[1].text)
+        gdppc = float(children[2].text)
+        # Parse neighbors
+        neighbors = {}
+        for child in children[3:]:
+            if (child.tag == 'neighbor' and
+                'name' in child.attrib and
+                'direction' in child.attrib):
+                neighbors[child.attrib['name']] = child.attrib['direction']
+            else:
+                raise TypeError(error_string(child, 'neighbor'))
+        countries[name] = dict(
+            rank=rank,
+            year=year,
+            gdppc=gdppc,
+            neighbors=neighbors,
+        )
+    return countries
+
+def parse_demo_record_if(instance):
+
+    """ if-elif-else version of match_json.parse_demo_record().
+
+    """
+    if not isinstance(instance, dict):
+        return None
+    if 'name' not in instance or 'price' not in instance:
+        return None
+    name = instance['name']
+    price = instance['price']
+    if not isinstance(name, str) or not isinstance(price, (int, float)):
+        return None
+    extra = {key: value
+             for key, value in instance.items()
+             if key not in ('name', 'price')}
+    return dict(name=name, price=price, extra=extra)
+
+def parse_geojson_record_if(instance):
+
+    """ if-elif-else version of match_geojson.parse_geojson_record().
+
+    """
+    # Note: the match version accepts any mapping, but the JSON decoder
+    # only creates dicts
+    if not isinstance(instance, dict) or 'type' not in instance:
+        return None
+    obj_type = instance['type']
+    if obj_type not in GEOJSON_TYPES:
+        return None
+    record = dict(type=obj_type, geometry=None, properties=None, extra={})
+    for name, value in instance.items():
+        if name == 'type':
+            continue
+        elif name == 'geometry':
+            record['geometry'] = value
+        elif name == 'properties':
+            record['properties'] = value
+        else:
+            record['extra'][name] = value
+    return record
+
+### Runners
+
+# Each runner parses the file filename using parse_fct and returns a
+# tuple (valid, invalid) with the number of valid and invalid records
+
+def run_countries(filename, parse_fct):
+    # The data is parsed incrementally and each country is dropped after
+    # processing, so that memory use stays flat for large files
+    valid = invalid = 0
+    root = None
+    depth = 0
+    for event, elem in iterparse(filename, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        # The parsers raise an exception for invalid data, so we pass
+        # them one country at a time
+        try:
+            parse_fct((elem,))
+        except (TypeError, ValueError):
+            invalid += 1
+        else:
+            valid += 1
+        root.clear()
+    return valid, invalid
+
+def run_countries_document(filename, parse_fct):
+    # The document parsers take the whole XML document, so they can only
+    # be used on valid data
+    with open(filename, 'rb') as file:
+        countries = parse_fct(file)
+    return len(countries), 0
+
+def parse_countries_etree(file):
+    # Note: this builds the complete tree in memory
+    return parse_countries_2(parse(file).getroot())
+
+def run_demo_records(filename, parse_fct):
+    valid = invalid = 0
+    with open(filename, 'rb') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                instance = json.loads(line)
+            except ValueError:
+                invalid += 1
+                continue
+            if parse_fct(instance) is None:
+                invalid += 1
+            else:
+                valid += 1
+    return valid, invalid
+
+def run_geojson(filename, parse_fct):
+    with open(filename, 'rb') as file:
+        collection = json.load(file)
+    valid = invalid = 0
+    for feature in collection['features']:
+        if parse_fct(feature) is None:
+            invalid += 1
+        else:
+            valid += 1
+    return valid, invalid
+
+# Benchmarks: data kind (see synthetic_data.KINDS), runner, list of
+# (engine name, parse function) tuples and a flag telling whether only
+# valid data can be used; the last engine is the baseline the others are
+# compared to
+BENCHMARKS = {
+    'xml': ('xml', run_countries, [
+        ('parse_countries_1', parse_countries_1),
+        ('parse_countries_2', parse_countries_2),
+        ('if-elif', parse_countries_if),
+    ], False),
+    'xml-engine': ('xml', run_countries_document, [
+        ('expat', parse_countries_expat),
+        ('ElementTree', parse_countries_etree),
+    ], True),
+    'json': ('json', run_demo_records, [
+        ('parse_demo_record', parse_demo_record),
+        ('if-elif', parse_demo_record_if),
+    ], False),
+    'geojson': ('geojson', run_geojson, [
+        ('parse_geojson_record', parse_geojson_record),
+        ('if-elif', parse_geojson_record_if),
+    ], False),
+}
+
+### Measurement
+
+def data_file(data_dir, kind, size, invalid, seed):
+
+    """ Return the name of the data file for the given parameters,
+        generating it, if it does not exist yet.
+
+    """
+    size = synthetic_data.parse_size(size)
+    filename = os.path.join(
+        data_dir,
+        f'{kind}-{synthetic_data.format_size(size)}-{invalid:g}-{seed}.'
+        f'{synthetic_data.KINDS[kind]}')
+    if not os.path.exists(filename):
+        os.makedirs(data_dir, exist_ok=True)
+        synthetic_data.generate_file(kind, filename, size, invalid, seed)
+    return filename
+
+def measure_parser(run_fct, filename, parse_fct, repeat=DEFAULT_REPEAT,
+                   memory=True):
+
+    """ Run parse_fct on filename using run_fct repeat times.
+
+        Returns a dict with the entries valid, invalid (record counts),
+        seconds (best time), records_per_second, mb_per_second and
+        peak_mb (peak memory use measured with tracemalloc in an extra
+        run, None if memory is false).
+
+    """
+    size = os.path.getsize(filename)
+    durations = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        valid, invalid = run_fct(filename, parse_fct)
+        durations.append(time.perf_counter() - t0)
+    seconds = min(durations) or 1e-9
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run_fct(filename, parse_fct)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return {
+        'valid': valid,
+        'invalid': invalid,
+        'seconds': seconds,
+        'records_per_second': (valid + invalid) / seconds,
+        'mb_per_second': size / 1e6 / seconds,
+        'peak_mb': peak_mb,
+    }
+
+def print_header():
+    print (f'{"format":10s} {"size":>6s} {"engine":22s} {"valid":>9s} '
+           f'{"invalid":>8s} {"records/s":>11s} {"MB/s":>8s} '
+           f'{"peak MB":>8s} {"speedup":>8s}')
+
+def print_result(kind, size, engine, result, baseline=None):
+    if result['peak_mb'] is None:
+        peak = '-'
+    else:
+        peak = f'{result["peak_mb"]:.1f}'
+    if baseline is None:
+        speedup = ''
+    else:
+        speedup = f'{baseline["seconds"] / result["seconds"]:.2f}x'
+    print (f'{kind:10s} {size:>6s} {engine:22s} {result["valid"]:9d} '
+           f'{result["invalid"]:8d} {result["records_per_second"]:11,.0f} '
+           f'{result["mb_per_second"]:8.2f} {peak:>8s} {speedup:>8s}')
+
+def run_benchmarks(formats=tuple(BENCHMARKS), sizes=DEFAULT_SIZES,
+                   invalid=DEFAULT_INVALID, seed=synthetic_data.DEFAULT_SEED,
+                   repeat=DEFAULT_REPEAT, data_dir=DEFAULT_DATA_DIR,
+                   memory=True):
+
+    """ Run the parser benchmarks for all formats and sizes and print
+        the results.
+
+        Returns a list of (format, size, engine, result) tuples, see
+        measure_parser() for the result dict.
+
+    """
+    results = []
+    print (f'Parser throughput ({invalid:.0%} invalid records, seed {seed}, '
+           f'best of {repeat}; speedup relative to the last engine of each '
+           f'format):')
+    print ()
+    print_header()
+    for size in sizes:
+        size = synthetic_data.format_size(synthetic_data.parse_size(size))
+        for kind in formats:
+            data_kind, run_fct, engines, valid_only = BENCHMARKS[kind]
+            filename = data_file(data_dir, data_kind, size,
+                                 0.0 if valid_only else invalid, seed)
+            # Run the baseline first, so that the others can be compared
+            # to it
+            baseline_name, baseline_fct = engines[-1]
+            baseline = measure_parser(run_fct, filename, baseline_fct,
+                                      repeat, memory)
+            for engine, parse_fct in engines[:-1]:
+                result = measure_parser(run_fct, filename, parse_fct,
+                                        repeat, memory)
+                print_result(kind, size, engine, result, baseline)
+                results.append((kind, size, engine, result))
+            print_result(kind, size, baseline_name, baseline)
+            results.append((kind, size, baseline_name, baseline))
+    return results
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='End-to-end parser throughput benchmarks')
+    argparser.add_argument(
+        '--size',
+        help='data sizes to use, e.g. 100KB 10MB 1GB; the ElementTree '
+             'engine of the xml-engine benchmark needs several times the '
+             f'size in memory (default: {" ".join(DEFAULT_SIZES)})',
+        nargs='+',
+        default=list(DEFAULT_SIZES))
+    argparser.add_argument(
+        '--invalid',
+        help='share of invalid records (0.0 - 1.0, default: '
+             f'{DEFAULT_INVALID})',
+        default=DEFAULT_INVALID,
+        type=float)
+    argparser.add_argument(
+        '--seed',
+        help=f'random seed (default: {synthetic_data.DEFAULT_SEED})',
+        default=synthetic_data.DEFAULT_SEED,
+        type=int)
+    argparser.add_argument(
+        '--formats',
+        help='data formats to benchmark (default: all)',
+        nargs='+',
+        choices=tuple(BENCHMARKS),
+        default=list(BENCHMARKS))
+    argparser.add_argument(
+        '--repeat',
+        help=f'number of timed runs per parser (default: {DEFAULT_REPEAT})',
+        default=DEFAULT_REPEAT,
+        type=int)
+    argparser.add_argument(
+        '--data-dir',
+        help='directory for the generated data files (default: '
+             f'{DEFAULT_DATA_DIR})',
+        default=DEFAULT_DATA_DIR)
+    argparser.add_argument(
+        '--no-memory',
+        help='do not measure the peak memory use (which needs an extra '
+             'run with tracemalloc)',
+        action='store_true')
+    args = argparser.parse_args(argv)
+    run_benchmarks(args.formats, args.size, args.invalid, args.seed,
+                   args.repeat, args.data_dir, not args.no_memory)
+
+###
+
+if __name__ == '__main__':
+    main()
@@ -2,12 +2,37 @@
 
 import inspect
 import ast
+import argparse
+import builtins
+import concurrent.futures
+import copy
+import difflib
+import hashlib
+import io
+import json
+import pathlib
+import sys
+import textwrap
+import tokenize
 from ast import *
 
 ### Globals
 
 _debug = 0
 
+# Print progress information while refactoring ?
+_verbose = 1
+
+# Default file name of the refactoring result cache used by the CLI
+DEFAULT_CACHE_FILE = '.match_ast_cache.json'
+
+# Benchmark gating parameters: loops per timing run, number of timing
+# runs (used to compute the confidence interval of the speedup) and
+# unroll factor of the bench functions
+GATE_LOOPS = 1000
+GATE_REPEAT = 7
+GATE_ITERATIONS = 5
+
 ### Examples
 
 def example(x):
@@ -37,7 +62,8 @@ def example_refactored(x):
 
 def if_refactor(if_node, varname, cases, orelse):
 
-    print (f'Found if which can be refactored')
+    if _verbose:
+        print (f'Found if which can be refactored')
 
     # Build match_cases
     case_nodes = [
@@ -51,11 +77,13 @@ def if_refactor(if_node, varname, cases, orelse):
             body=body)
         for (varname, typename, condition, body) in cases
     ]
-    case_nodes.append(
-        match_case(
-              pattern=MatchAs(),
-              body=orelse)
-    )
+    if orelse:
+        # An empty default case would not compile
+        case_nodes.append(
+            match_case(
+                  pattern=MatchAs(),
+                  body=orelse)
+        )
 
     # Build Match node
     match_node = Match(
@@ -112,11 +140,12 @@ def scan_if(node, varname, test, body, orelse, cases=None):
 
 def function_refactor(fct_node, name, varname):
 
-    print (f'Found function {name} with variable {varname}')
+    if _verbose:
+        print (f'Found function {name} with variable {varname}')
 
     # Find if-elif-else
     new_body = []
-    for node in fct_node.body:
+    for i, node in enumerate(fct_node.body):
         match node:
             case If(test, body, orelse):
                 # Scan for match cases written as if-elif chain
@@ -127,7 +156,8 @@ def function_refactor(fct_node, name, varname):
                     node = if_refactor(node, varname,
                                        cases, orelse)
             case _:
-                # Not an if node
+                # Not an if node: keep the remaining statements
+                new_body.extend(fct_node.body[i:])
                 break
         new_body.append(node)
     fct_node.body = new_body
@@ -150,6 +180,652 @@ def if_match_refactor(fct):
 
     return tree
 
+### Source refactoring
+
+def refactor_source(source, filename='<unknown>', accept=None):
+
+    """ Refactor all candidate if-elif chains in source and return the
+        new source code.
+
+        In contrast to if_match_refactor(), this works on source code
+        directly and looks at all functions taking a single argument,
+        including nested functions and methods. Only the refactored
+        if statements are replaced, so that the rest of the source
+        (including comments and formatting) is left untouched.
+
+        Candidates using isinstance() with names which are not known
+        to be classes (see class_names()) are skipped with a warning,
+        since a class pattern fails for e.g. a tuple of classes. The
+        same is done for candidates containing comments or multi-line
+        strings, which would be lost or reformatted by ast.unparse()
+        (see formatted_lines()).
+
+        If given, accept(name, varname, if_node, match_node) is called
+        for each candidate and has to return true for the rewrite to
+        be applied, see benchmark_gate().
+
+        Raises a ValueError in case the refactored source does not
+        parse.
+
+    """
+    tree = ast.parse(source, filename)
+    classes = class_names(tree)
+    formatted = formatted_lines(source)
+
+    # Refactor all functions, remembering the replaced if nodes
+    replacements = []
+    for node in ast.walk(tree):
+        match node:
+            case FunctionDef(
+                name,
+                args=arguments(args=[arg(arg=varname)])):
+                old_body = node.body
+                function_refactor(node, name, varname)
+                for i, (old_node, new_node) in enumerate(
+                        zip(old_body, node.body)):
+                    if new_node is old_node:
+                        continue
+                    unknown = [
+                        case.pattern.cls.id
+                        for case in new_node.cases
+                        if isinstance(case.pattern, MatchClass) and
+                           case.pattern.cls.id not in classes]
+                    if unknown:
+                        print (f'{filename}:{old_node.lineno}: {name}: '
+                               f'{", ".join(unknown)} not known to be a '
+                               f'class, rewrite skipped', file=sys.stderr)
+                        node.body[i] = old_node
+                        continue
+                    if any(lineno in formatted
+                           for lineno in range(old_node.lineno,
+                                               old_node.end_lineno + 1)):
+                        print (f'{filename}:{old_node.lineno}: {name}: '
+                               f'contains comments or multi-line strings, '
+                               f'rewrite skipped', file=sys.stderr)
+                        node.body[i] = old_node
+                        continue
+                    if (accept is not None and
+                        not accept(name, varname, old_node, new_node)):
+                        # Revert the rewrite
+                        node.body[i] = old_node
+                        continue
+                    replacements.append((old_node, new_node))
+            case _:
+                pass
+    new_source = splice_nodes(source, replacements)
+
+    # Never return code which does not parse
+    try:
+        ast.parse(new_source, filename)
+    except SyntaxError as error:
+        raise ValueError(
+            f'refactored code of {filename} does not parse: {error}')
+    return new_source
+
+def formatted_lines(source):
+
+    """ Return the set of line numbers in source which contain comments
+        or (parts of) multi-line strings.
+
+        ast.unparse() drops comments and writes strings as escaped
+        one-line literals, so statements using these lines cannot be
+        replaced without losing formatting.
+
+    """
+    lines = set()
+    for token in tokenize.generate_tokens(io.StringIO(source).readline):
+        if token.type == tokenize.COMMENT:
+            lines.add(token.start[0])
+        elif token.start[0] != token.end[0]:
+            # Only (f-)strings can span lines
+            lines.update(range(token.start[0], token.end[0] + 1))
+    return lines
+
+def class_names(tree):
+
+    """ Return the set of names which are known to refer to classes in
+        the module tree.
+
+        These are the builtin types and the classes defined in the
+        module, unless the name is bound in some other way anywhere in
+        the module (e.g. assigned, imported or used as argument).
+
+    """
+    classes = {name
+               for name, obj in vars(builtins).items()
+               if isinstance(obj, type)}
+    rebound = set()
+    for node in ast.walk(tree):
+        match node:
+            case ClassDef(name=name):
+                classes.add(name)
+            case (Name(id=name, ctx=Store()) |
+                  FunctionDef(name=name) |
+                  AsyncFunctionDef(name=name) |
+                  arg(arg=name)):
+                rebound.add(name)
+            case alias(name=name, asname=asname):
+                rebound.add(asname or name.partition('.')[0])
+            case _:
+                pass
+    return classes - rebound
+
+def splice_nodes(source, replacements):
+
+    """ Replace the statements in source given as list of (old_node,
+        new_node) tuples with the unparsed code of the new nodes.
+
+        old_node has to provide the position information. Replacements
+        nested inside other replacements are ignored, since these
+        are already included in the outer ones.
+
+    """
+    if not replacements:
+        return source
+
+    # Drop replacements nested inside other replacements
+    replacements = sorted(
+        replacements, key=lambda x: (x[0].lineno, -x[0].end_lineno))
+    outer_replacements = []
+    end_lineno = 0
+    for old_node, new_node in replacements:
+        if old_node.lineno > end_lineno:
+            outer_replacements.append((old_node, new_node))
+            end_lineno = old_node.end_lineno
+
+    # Splice in the new code, starting at the end of the source
+    lines = source.splitlines(keepends=True)
+    for old_node, new_node in reversed(outer_replacements):
+        new_code = textwrap.indent(
+            ast.unparse(new_node) + '\n',
+            ' ' * old_node.col_offset)
+        lines[old_node.lineno - 1:old_node.end_lineno] = [new_code]
+    return ''.join(lines)
+
+### Benchmark gating
+
+def strip_bodies(if_node, match_node):
+
+    """ Return copies of if_node and match_node with all case bodies
+        replaced by pass, so that only the dispatch is left.
+
+        Any remaining (non-refactored) elif tests end up in the
+        default case, so these are removed in both versions.
+
+    """
+    if_node = copy.deepcopy(if_node)
+    match_node = copy.deepcopy(match_node)
+    count = sum(isinstance(case.pattern, MatchClass)
+                for case in match_node.cases)
+    node = if_node
+    for i in range(count):
+        node.body = [Pass()]
+        if i < count - 1:
+            node = node.orelse[0]
+        elif node.orelse:
+            node.orelse = [Pass()]
+    for case in match_node.cases:
+        case.body = [Pass()]
+    return if_node, match_node
+
+def default_inputs(match_node):
+
+    """ Return a list of input expressions (as source code) exercising
+        all cases of match_node.
+
+        This uses a default instance for each builtin type matched and
+        None for the default case.
+
+    """
+    inputs = []
+    for case in match_node.cases:
+        match case.pattern:
+            case MatchClass(cls=Name(id=typename)) if isinstance(
+                    getattr(builtins, typename, None), type):
+                inputs.append(f'{typename}()')
+            case _:
+                pass
+    inputs.append('None')
+    return inputs
+
+def time_statement(fct_name, varname, statement, inputs):
+
+    """ Time statement using a micro_benchmark bench function which
+        runs statement for each of the inputs (given as list of
+        expressions) bound to varname.
+
+        Returns a list with the time per dispatch in seconds for each
+        of the GATE_REPEAT timing runs.
+
+    """
+    import micro_benchmark
+
+    code = textwrap.indent(ast.unparse(statement) + '\n', ' ' * 8)
+    lines = [
+        f'def {fct_name}():\n',
+        f'    # Init\n',
+        f'    inputs = [{", ".join(inputs)}]\n',
+        f'    # Bench\n',
+        f'    for {varname} in inputs:\n',
+        *code.splitlines(keepends=True),
+    ]
+    fct_name, code = micro_benchmark.source_benchmark_code(
+        lines, iterations=GATE_ITERATIONS)
+    bench_fct = micro_benchmark.compile_benchmark(fct_name, code)
+    dispatches = GATE_LOOPS * GATE_ITERATIONS * len(inputs)
+    return [bench_fct(GATE_LOOPS) / dispatches
+            for i in range(GATE_REPEAT)]
+
+def benchmark_gate(inputs=None, min_speedup=1.0, report=None):
+
+    """ Return an accept function for refactor_source(), which only
+        accepts rewrites that are measurably faster.
+
+        Both versions of each candidate are timed as micro_benchmark
+        bench functions (with the case bodies stripped, see
+        strip_bodies()). inputs may be given as dict mapping function
+        names to lists of input expressions; default_inputs() is used
+        for all other functions. A rewrite is only accepted if the
+        match version is significantly faster: the lower bound of the
+        95% confidence interval of the speedup (see
+        micro_benchmark.speedup_interval()) has to exceed min_speedup,
+        so that noise is not mistaken for a speedup.
+
+        The bench functions are compiled in the namespace of
+        micro_benchmark, not in that of the refactored module, which is
+        never imported. Candidates testing classes defined in (or
+        imported by) the module therefore cannot be benchmarked; they
+        are reported as such and kept.
+
+        A report line is printed to report (defaults to sys.stdout)
+        for each candidate.
+
+    """
+    import micro_benchmark
+
+    if inputs is None:
+        inputs = {}
+    if report is None:
+        report = sys.stdout
+
+    def accept(name, varname, if_node, match_node):
+        fct_inputs = inputs.get(name) or default_inputs(match_node)
+        if_stmt, match_stmt = strip_bodies(if_node, match_node)
+        try:
+            if_times = time_statement(
+                f'bench_if_{name}', varname, if_stmt, fct_inputs)
+            match_times = time_statement(
+                f'bench_match_{name}', varname, match_stmt, fct_inputs)
+        except Exception as error:
+            print (f'{name}: could not benchmark ({error!r}), '
+                   f'rewrite skipped', file=report)
+            return False
+        (if_time, match_time,
+         speedup, ci_low, ci_high) = micro_benchmark.speedup_interval(
+             if_times, match_times)
+        accepted = ci_low > min_speedup
+        print (f'{name}: if {if_time * 1e9:.1f} ns, '
+               f'match {match_time * 1e9:.1f} ns, '
+               f'speedup {speedup:.2f}x '
+               f'[{ci_low:.2f}x, {ci_high:.2f}x] -> '
+               f'{"rewritten" if accepted else "kept"}',
+               file=report)
+        return accepted
+
+    return accept
+
+### Case reordering
+
+# Builtin types which cannot have common subclasses (their instance
+# layouts conflict), so class patterns using two different ones of these
+# can never both match, unless one is a subclass of the other
+LAYOUT_TYPES = {
+    'bool', 'int', 'float', 'complex',
+    'str', 'bytes', 'bytearray',
+    'list', 'tuple', 'dict', 'set', 'frozenset',
+}
+
+def layout_type(cls):
+    match cls:
+        case Name(id=typename) if typename in LAYOUT_TYPES:
+            return getattr(builtins, typename)
+        case _:
+            return None
+
+def sequences_disjoint(patterns1, patterns2):
+
+    """ Return True if the sequence patterns with the subpatterns
+        patterns1 and patterns2 can never both match.
+
+    """
+    def split(patterns):
+        for i, pattern in enumerate(patterns):
+            if isinstance(pattern, MatchStar):
+                return patterns[:i], patterns[i + 1:], True
+        return patterns, patterns, False
+
+    prefix1, suffix1, star1 = split(patterns1)
+    prefix2, suffix2, star2 = split(patterns2)
+    length1 = len(patterns1) - star1
+    length2 = len(patterns2) - star2
+
+    # Check lengths
+    if not star1 and not star2 and length1 != length2:
+        return True
+    if star1 and not star2 and length2 < length1:
+        return True
+    if star2 and not star1 and length1 < length2:
+        return True
+
+    # Check items aligned at the start and the end
+    if any(patterns_disjoint(pattern1, pattern2)
+           for pattern1, pattern2 in zip(prefix1, prefix2)):
+        return True
+    return any(patterns_disjoint(pattern1, pattern2)
+               for pattern1, pattern2 in zip(reversed(suffix1),
+                                             reversed(suffix2)))
+
+def patterns_disjoint(pattern1, pattern2):
+
+    """ Return True if pattern1 and pattern2 can provably never match
+        the same subject.
+
+        The check is conservative: False is returned for everything
+        which cannot be decided from the patterns alone. Value patterns
+        are assumed to be compared against subjects implementing
+        standard equality.
+
+    """
+    match pattern1, pattern2:
+        case (MatchAs(pattern=None), _) | (_, MatchAs(pattern=None)):
+            # Wildcard or capture pattern
+            return False
+        case (MatchAs(pattern=pattern), other) | (other, MatchAs(pattern=pattern)):
+            return patterns_disjoint(pattern, other)
+        case (MatchOr(patterns=patterns), other) | (other, MatchOr(patterns=patterns)):
+            return all(patterns_disjoint(pattern, other)
+                       for pattern in patterns)
+        case MatchSingleton(value=value1), MatchSingleton(value=value2):
+            return value1 is not value2
+        case ((MatchSingleton(value=value), MatchClass(cls=cls)) |
+              (MatchClass(cls=cls), MatchSingleton(value=value))):
+            type_ = layout_type(cls)
+            return type_ is not None and not isinstance(value, type_)
+        case (MatchValue(value=Constant(value=value1)),
+              MatchValue(value=Constant(value=value2))):
+            return value1 != value2
+        case (MatchClass(cls=cls1, kwd_attrs=attrs1, kwd_patterns=patterns1),
+              MatchClass(cls=cls2, kwd_attrs=attrs2, kwd_patterns=patterns2)):
+            type1 = layout_type(cls1)
+            type2 = layout_type(cls2)
+            if (type1 is not None and type2 is not None and
+                not issubclass(type1, type2) and
+                not issubclass(type2, type1)):
+                return True
+            if ast.dump(cls1) != ast.dump(cls2):
+                return False
+            # Same class: check keyword subpatterns
+            attr_patterns2 = dict(zip(attrs2, patterns2))
+            return any(
+                attr in attr_patterns2 and
+                patterns_disjoint(pattern, attr_patterns2[attr])
+                for attr, pattern in zip(attrs1, patterns1))
+        case MatchSequence(patterns=patterns1), MatchSequence(patterns=patterns2):
+            return sequences_disjoint(patterns1, patterns2)
+        case (MatchSequence(), MatchMapping()) | (MatchMapping(), MatchSequence()):
+            return True
+        case ((MatchSingleton(), MatchSequence() | MatchMapping()) |
+              (MatchSequence() | MatchMapping(), MatchSingleton())):
+            # None, True and False are neither sequences nor mappings
+            return True
+        case ((MatchSequence(), MatchClass(cls=cls)) |
+              (MatchClass(cls=cls), MatchSequence())):
+            # Sequence patterns never match str, bytes and bytearray
+            return layout_type(cls) in (str, bytes, bytearray)
+        case (MatchMapping(keys=keys1, patterns=patterns1),
+              MatchMapping(keys=keys2, patterns=patterns2)):
+            key_patterns2 = {ast.dump(key): pattern
+                             for key, pattern in zip(keys2, patterns2)}
+            return any(
+                ast.dump(key) in key_patterns2 and
+                patterns_disjoint(pattern, key_patterns2[ast.dump(key)])
+                for key, pattern in zip(keys1, patterns1))
+        case _:
+            return False
+
+def reorder_cases(match_node, hits):
+
+    """ Reorder the cases of match_node by descending hit counts.
+
+        hits maps the line numbers of the case patterns to their hit
+        counts. Two adjacent cases are only swapped if their patterns
+        are disjoint (see patterns_disjoint()), so at most one of them
+        can match any subject. Guards are only evaluated for matching
+        patterns and captures are only bound on success, so guards and
+        bindings keep their meaning.
+
+        Returns True if the order was changed.
+
+    """
+    cases = match_node.cases
+    counts = [hits.get(case.pattern.lineno, 0) for case in cases]
+    changed = False
+    swapped = True
+    while swapped:
+        swapped = False
+        for i in range(len(cases) - 1):
+            if (counts[i + 1] > counts[i] and
+                patterns_disjoint(cases[i].pattern, cases[i + 1].pattern)):
+                cases[i], cases[i + 1] = cases[i + 1], cases[i]
+                counts[i], counts[i + 1] = counts[i + 1], counts[i]
+                swapped = changed = True
+    return changed
+
+def reorder_source(source, hits, filename='<unknown>'):
+
+    """ Reorder the cases of all match statements in source by hit
+        counts (see reorder_cases()) and return the new source code.
+
+        Only the changed match statements are replaced in source.
+
+    """
+    tree = ast.parse(source, filename)
+    replacements = [
+        (node, node)
+        for node in ast.walk(tree)
+        if isinstance(node, Match) and reorder_cases(node, hits)]
+    return splice_nodes(source, replacements)
+
+def reorder_function(fct, hits):
+
+    """ Return the source code of function fct with the cases of its
+        match statements reordered by hit counts.
+
+        hits maps line numbers of case patterns in the file defining
+        fct to hit counts, e.g. as collected by a profiling run.
+
+    """
+    (lines, start_lineno) = inspect.getsourcelines(fct)
+    source = textwrap.dedent(''.join(lines))
+    hits = {lineno - start_lineno + 1: count
+            for lineno, count in hits.items()}
+    return reorder_source(source, hits, inspect.getsourcefile(fct))
+
+### File refactoring
+
+def refactor_file_worker(filename, source, benchmark=False):
+
+    """ Refactor source read from filename.
+
+        Returns a tuple (new source or None, error message or None). The
+        new source is None, if nothing needed to be refactored.
+
+        If benchmark is true, only rewrites which are faster are
+        applied (see benchmark_gate()); the report is written to
+        stderr.
+
+    """
+    global _verbose
+    _verbose = 0
+    if benchmark:
+        accept = benchmark_gate(report=sys.stderr)
+    else:
+        accept = None
+    try:
+        new_source = refactor_source(source, filename, accept)
+    except SyntaxError as error:
+        return None, f'could not parse {filename}: {error}'
+    except ValueError as error:
+        return None, str(error)
+    if new_source == source:
+        return None, None
+    return new_source, None
+
+def find_source_files(paths):
+    files = []
+    for path in paths:
+        path = pathlib.Path(path)
+        if path.is_dir():
+            files.extend(sorted(path.rglob('*.py')))
+        else:
+            files.append(path)
+    return files
+
+def tool_hash():
+
+    """ Return a hash of this module, used to invalidate the result
+        cache whenever the refactoring code changes.
+
+    """
+    with open(__file__, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def load_cache(cache_file):
+    try:
+        with open(cache_file, encoding='utf-8') as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('tool') != tool_hash():
+        return {}
+    return cache.get('results', {})
+
+def save_cache(cache_file, results):
+    with open(cache_file, 'w', encoding='utf-8') as file:
+        json.dump({'tool': tool_hash(), 'results': results}, file)
+
+def refactor_files(files, jobs=None, cache_file=DEFAULT_CACHE_FILE,
+                   benchmark=False):
+
+    """ Refactor all files and return a list of tuples
+        (filename, source, new source or None, error or None).
+
+        The files are processed by a process pool using jobs worker
+        processes (defaults to the number of CPUs). Results are cached
+        in cache_file keyed by the content hash of the files, so that
+        unchanged files are skipped on reruns. Pass None as cache_file
+        to disable caching.
+
+        benchmark is passed on to refactor_file_worker(). Since
+        parallel runs would distort the timings, only a single worker
+        process is used in this mode.
+
+    """
+    if benchmark:
+        jobs = 1
+    if cache_file:
+        cache = load_cache(cache_file)
+    else:
+        cache = {}
+
+    # Read files and check the cache
+    results = {}
+    sources = {}
+    todo = []
+    for filename in files:
+        with open(filename, 'rb') as file:
+            data = file.read()
+        source = data.decode('utf-8')
+        sources[filename] = source
+        key = hashlib.sha256(data).hexdigest()
+        if benchmark:
+            key = f'benchmark:{key}'
+        if key in cache:
+            results[filename] = cache[key]
+        else:
+            todo.append((filename, key))
+    if _debug:
+        print (f'{len(files) - len(todo)} files found in cache')
+
+    # Process the remaining files
+    if todo:
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            new_results = executor.map(
+                refactor_file_worker,
+                [str(filename) for filename, key in todo],
+                [sources[filename] for filename, key in todo],
+                [benchmark] * len(todo),
+                chunksize=16)
+            for (filename, key), result in zip(todo, new_results):
+                results[filename] = result
+                if result[1] is None:
+                    # Don't cache errors
+                    cache[key] = result
+
+    if cache_file:
+        save_cache(cache_file, cache)
+    return [(filename, sources[filename], *results[filename])
+            for filename in files]
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Refactor isinstance() if-elif chains to match '
+                    'statements')
+    argparser.add_argument(
+        'paths', nargs='+',
+        help='source files or directories to scan for *.py files')
+    argparser.add_argument(
+        '-w', '--write', action='store_true',
+        help='rewrite the files instead of printing a unified diff')
+    argparser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of worker processes (default: number of CPUs)')
+    argparser.add_argument(
+        '--cache', default=DEFAULT_CACHE_FILE,
+        help=f'result cache file (default: {DEFAULT_CACHE_FILE})')
+    argparser.add_argument(
+        '--no-cache', action='store_true',
+        help='do not use the result cache')
+    argparser.add_argument(
+        '--benchmark', action='store_true',
+        help='only apply rewrites which benchmark faster')
+    args = argparser.parse_args(argv)
+
+    files = find_source_files(args.paths)
+    results = refactor_files(
+        files,
+        jobs=args.jobs,
+        cache_file=None if args.no_cache else args.cache,
+        benchmark=args.benchmark)
+    rc = 0
+    for filename, source, new_source, error in results:
+        if error is not None:
+            print (error, file=sys.stderr)
+            rc = 1
+            continue
+        if new_source is None:
+            continue
+        if args.write:
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.write(new_source)
+            print (f'refactored {filename}', file=sys.stderr)
+        else:
+            sys.stdout.writelines(difflib.unified_diff(
+                source.splitlines(keepends=True),
+                new_source.splitlines(keepends=True),
+                f'{filename} (original)', f'{filename} (refactored)'))
+    return rc
+
 ### Helpers
 
 def print_ast(fct):
@@ -168,6 +844,8 @@ def print_function(fct):
 ###
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sys.exit(main())
     print ('Before refactoring:')
     print_function(example)
     if _debug:
@@ -37,6 +37,29 @@ def parse_geojson_data(instance):
         case wrong_values:
             print (f'could not parse object: {wrong_values!r}')
 
+# Silent variant of parse_geojson_data() used for batch processing,
+# returning the parsed object as dict or None for invalid instances. Its
+# cases mirror those of parse_geojson_data() and have to be kept in sync
+# by hand.
+def parse_geojson_record(instance):
+    match instance:
+        case {'type': obj_type, **other_members} as obj:
+            if obj_type not in GEOJSON_TYPES:
+                return None
+            record = dict(type=obj_type, geometry=None, properties=None,
+                          extra={})
+            for obj_member in other_members.items():
+                match obj_member:
+                    case ('geometry', geometry):
+                        record['geometry'] = geometry
+                    case ('properties', properties):
+                        record['properties'] = properties
+                    case (name, value):
+                        record['extra'][name] = value
+            return record
+        case wrong_values:
+            return None
+
 ###
 
 if __name__ == '__main__':
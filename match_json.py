@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 
+import json
+import mmap
 import numbers
+import os
+import sys
+import time
 
 ### Examples
 
@@ -75,10 +80,101 @@ def parse_list_data(many_instances):
         case wrong_data:
             print (f'unknown data format: {wrong_data!r}')
 
+### Bulk ingestion
+
+# The bulk ingestion path deliberately uses its own copy of the match
+# cases of parse_demo_data(), since printing each result would dominate
+# the timings. Changes to the cases have to be applied to both.
+
+# Validation and parsing of a single instance, returning the parsed record
+# as dict or None, in case the instance is invalid
+def parse_demo_record(instance):
+    match instance:
+        case dict() as data_item:
+            match data_item:
+                case {
+                    'name': str() as name,
+                    'price': int(price) | float(price),
+                    **extra}:
+                    return dict(name=name, price=price, extra=extra)
+                case wrong_values:
+                    return None
+        case wrong_values:
+            return None
+
+def iter_ndjson_records(filename, stats):
+
+    """ Generator yielding the valid records parsed from the
+        newline-delimited JSON file filename.
+
+        The file is memory-mapped and decoded one line at a time.
+        stats must be a dict initialized as done by ingest_ndjson().
+        It is updated while the generator is consumed.
+
+    """
+    with open(filename, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if not size:
+            # mmap does not support empty files
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # only the decoding and matching is timed, not the time
+            # the consumer spends between the yields
+            t0 = time.perf_counter()
+            for line in iter(data.readline, b''):
+                stats['bytes'] += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    instance = json.loads(line)
+                except ValueError:
+                    record = None
+                else:
+                    record = parse_demo_record(instance)
+                if record is None:
+                    stats['invalid'] += 1
+                    continue
+                stats['valid'] += 1
+                stats['seconds'] += time.perf_counter() - t0
+                yield record
+                t0 = time.perf_counter()
+            stats['seconds'] += time.perf_counter() - t0
+
+def ingest_ndjson(filename):
+
+    """ Bulk ingestion of a newline-delimited JSON file filename.
+
+        Returns a tuple (stats, records). records is a generator
+        yielding the valid records as dicts with keys name, price and
+        extra. stats is a dict with the entries valid, invalid (record
+        counts), bytes and seconds (decoding and matching time only),
+        which get updated while records is consumed.
+
+        Use print_ingest_stats() to report the throughput.
+
+    """
+    stats = dict(valid=0, invalid=0, bytes=0, seconds=0.0)
+    return stats, iter_ndjson_records(filename, stats)
+
+def print_ingest_stats(stats):
+    count = stats['valid'] + stats['invalid']
+    seconds = stats['seconds'] or 1e-9
+    print (f'valid records:   {stats["valid"]}')
+    print (f'invalid records: {stats["invalid"]}')
+    print (f'throughput:      {count / seconds:.0f} records/s, '
+           f'{stats["bytes"] / 1e6 / seconds:.2f} MB/s')
+
 ###
 
 if __name__ == '__main__':
     import pprint
+    if len(sys.argv) > 1:
+        # Bulk ingest an NDJSON file
+        stats, records = ingest_ndjson(sys.argv[1])
+        for record in records:
+            pass
+        print_ingest_stats(stats)
+        sys.exit(0)
     parse_demo_data(demo_data_1)
     parse_demo_data(demo_data_1a)
     parse_demo_data(demo_data_2)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+""" Run the match based parsers on multiple cores
+
+    The input (a list of instances or the top-level children of an XML
+    tree) is split into batches, which are then processed by a
+    concurrent.futures process pool. Results are merged back in input
+    order.
+
+    Small inputs are processed in-process, since pickling the data for
+    the worker processes would cost more than it saves.
+
+    On free-threaded Python builds (3.13t+), a thread pool can be used
+    instead, which avoids pickling altogether. On builds with the GIL
+    enabled, the threaded mode issues a warning and runs sequentially.
+
+"""
+import concurrent.futures
+import itertools
+import os
+import sys
+import time
+import warnings
+
+import match_geojson
+import match_json
+import match_xml
+
+### Globals
+
+# Default number of items per batch
+DEFAULT_CHUNK_SIZE = 2000
+
+# Inputs with fewer items than this are processed in-process
+DEFAULT_MIN_ITEMS = 20000
+
+### Helpers
+
+def gil_enabled():
+
+    """ Return True if the GIL is enabled in the running interpreter.
+
+    """
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    if is_gil_enabled is None:
+        # Python < 3.13 always has the GIL
+        return True
+    return is_gil_enabled()
+
+def cpu_count():
+    if hasattr(os, 'process_cpu_count'):
+        return os.process_cpu_count() or 1
+    return os.cpu_count() or 1
+
+### Executor
+
+def iter_batches(items, chunk_size=DEFAULT_CHUNK_SIZE):
+    for i in range(0, len(items), chunk_size):
+        yield items[i:i + chunk_size]
+
+def parallel_execute(batch_fct, items,
+                     chunk_size=DEFAULT_CHUNK_SIZE,
+                     max_workers=None,
+                     min_items=DEFAULT_MIN_ITEMS,
+                     use_threads=False):
+
+    """ Run batch_fct on batches of items and return the list of batch
+        results in input order.
+
+        batch_fct must be a module level function taking a list of
+        items, so that it can be used by the worker processes.
+
+        chunk_size sets the number of items per batch, max_workers the
+        number of worker processes (defaults to the number of CPUs).
+        If there are fewer than min_items items or only one worker or
+        batch would be used, batch_fct is called in-process on all
+        items instead.
+
+        If use_threads is true, a thread pool is used instead of a
+        process pool. This only makes sense on free-threaded builds,
+        so a RuntimeWarning is issued and the items are processed
+        sequentially, if the GIL is enabled.
+
+    """
+    items = list(items)
+    if max_workers is None:
+        max_workers = cpu_count()
+    if use_threads and max_workers > 1 and gil_enabled():
+        warnings.warn('the GIL is enabled, running sequentially',
+                      RuntimeWarning, stacklevel=2)
+        max_workers = 1
+    if (len(items) < min_items or
+        max_workers <= 1 or
+        len(items) <= chunk_size):
+        return [batch_fct(items)]
+    if use_threads:
+        executor_class = concurrent.futures.ThreadPoolExecutor
+    else:
+        executor_class = concurrent.futures.ProcessPoolExecutor
+    with executor_class(max_workers) as executor:
+        return list(executor.map(batch_fct,
+                                 iter_batches(items, chunk_size)))
+
+### Batch functions
+
+def parse_list_batch(instances):
+    return [match_json.parse_demo_record(instance)
+            for instance in instances]
+
+def parse_geojson_batch(instances):
+    return [match_geojson.parse_geojson_record(instance)
+            for instance in instances]
+
+### Parallel parsers
+
+def parallel_parse_list_data(many_instances, **kws):
+
+    """ Parallel version of match_json.parse_list_data().
+
+        Returns a list with one parsed record (or None, for invalid
+        instances) per instance, see match_json.parse_demo_record().
+        Keyword arguments are passed on to parallel_execute().
+
+    """
+    results = parallel_execute(parse_list_batch, many_instances, **kws)
+    return list(itertools.chain.from_iterable(results))
+
+def parallel_parse_geojson_data(many_instances, **kws):
+
+    """ Parallel version of match_geojson.parse_geojson_data() for a
+        list of instances.
+
+        Returns a list with one parsed record (or None, for invalid
+        instances) per instance, see
+        match_geojson.parse_geojson_record(). Keyword arguments are
+        passed on to parallel_execute().
+
+    """
+    results = parallel_execute(parse_geojson_batch, many_instances, **kws)
+    return list(itertools.chain.from_iterable(results))
+
+def parallel_parse_countries_2(tree, **kws):
+
+    """ Parallel version of match_xml.parse_countries_2().
+
+        The top-level children of tree are distributed to the workers.
+        Returns the same dict as match_xml.parse_countries_2().
+        Keyword arguments are passed on to parallel_execute().
+
+    """
+    results = parallel_execute(match_xml.parse_countries_2, tree, **kws)
+    countries = {}
+    for batch_countries in results:
+        countries.update(batch_countries)
+    return countries
+
+def threaded_parse_list_data(many_instances, **kws):
+
+    """ Same as parallel_parse_list_data(), but using a thread pool.
+
+    """
+    return parallel_parse_list_data(many_instances,
+                                    use_threads=True, **kws)
+
+def threaded_parse_countries_2(tree, **kws):
+
+    """ Same as parallel_parse_countries_2(), but using a thread pool.
+
+    """
+    return parallel_parse_countries_2(tree, use_threads=True, **kws)
+
+### Measurements
+
+def measure_speedup(parallel_fct, data, repeat=3, **kws):
+
+    """ Measure the speedup of parallel_fct(data, **kws) compared to
+        running it with a single worker.
+
+        The best time of repeat runs is used for both. Prints a short
+        report and returns a tuple (sequential time, parallel time,
+        speedup).
+
+    """
+    def best_time(**kws):
+        times = []
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            parallel_fct(data, **kws)
+            times.append(time.perf_counter() - t0)
+        return min(times)
+
+    sequential_time = best_time(**{**kws, 'max_workers': 1})
+    parallel_time = best_time(**kws)
+    speedup = sequential_time / parallel_time
+    print (f'{parallel_fct.__name__}: '
+           f'sequential {sequential_time:.3f}s, '
+           f'parallel {parallel_time:.3f}s, '
+           f'speedup {speedup:.2f}x '
+           f'({cpu_count()} CPUs, GIL {"enabled" if gil_enabled() else "disabled"})')
+    return sequential_time, parallel_time, speedup
+
+###
+
+if __name__ == '__main__':
+    instances = match_json.demo_data_list * 200000
+    measure_speedup(parallel_parse_list_data, instances)
+    if not gil_enabled():
+        measure_speedup(threaded_parse_list_data, instances)
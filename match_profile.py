@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+""" Case hit instrumentation for functions using the match statement
+
+    The instrumentation rewrites the function code to count hits and time
+    spent per case arm and per function. It is opt-in: instrumented
+    functions get their code object replaced and restoring the original
+    one removes all overhead again.
+
+    A sampling rate can be given to keep the overhead low under real
+    load. Counters can be exported as dict or JSON snapshot. The case
+    hits can be passed to match_ast.reorder_function() to reorder the
+    cases by frequency.
+
+"""
+import ast
+import inspect
+import json
+import random
+import textwrap
+import time
+from ast import *
+
+### Globals
+
+_debug = 0
+
+# Value used in snapshots for match statements where no case matched
+NO_MATCH = 'no match'
+
+### Instrumentation
+
+class MatchInstrumenter(ast.NodeTransformer):
+
+    """ Add profiling calls to all match statements of a function.
+
+        profile_name is the global name under which the CaseProfiler
+        can be found, key the function key used for the counters.
+
+    """
+    def __init__(self, profile_name, key):
+        self.profile_name = profile_name
+        self.key = key
+        self.count = 0
+
+    def profile_call(self, method, *args):
+        return Call(
+            func=Attribute(value=Name(id=self.profile_name, ctx=Load()),
+                           attr=method, ctx=Load()),
+            args=list(args),
+            keywords=[])
+
+    def timed(self, token, body, method, *args):
+
+        """ Return statements running body, calling the profiler method
+            with args and the start time after body has run, if the
+            execution was sampled.
+
+        """
+        return [
+            Assign(targets=[Name(id=token, ctx=Store())],
+                   value=self.profile_call('enter')),
+            Try(
+                body=body,
+                handlers=[],
+                orelse=[],
+                finalbody=[
+                    If(test=Compare(left=Name(id=token, ctx=Load()),
+                                    ops=[IsNot()],
+                                    comparators=[Constant(value=None)]),
+                       body=[Expr(value=self.profile_call(
+                           method, *args, Name(id=token, ctx=Load())))],
+                       orelse=[]),
+                ]),
+        ]
+
+    def visit_Match(self, node):
+        self.generic_visit(node)
+        token = f'_mp_token_{self.count}'
+        arm = f'_mp_arm_{self.count}'
+        self.count += 1
+        for case in node.cases:
+            case.body.insert(0, Assign(
+                targets=[Name(id=arm, ctx=Store())],
+                value=Constant(value=case.pattern.lineno)))
+        return [
+            Assign(targets=[Name(id=arm, ctx=Store())],
+                   value=Constant(value=None)),
+            *self.timed(token, [node], 'leave_case',
+                        Constant(value=self.key),
+                        Constant(value=node.lineno),
+                        Name(id=arm, ctx=Load())),
+        ]
+
+    def instrument_function(self, fct_node):
+        self.visit(fct_node)
+        body = fct_node.body
+        match body:
+            case [Expr(value=Constant(value=str())) as docstring, *body]:
+                prefix = [docstring]
+            case _:
+                prefix = []
+        fct_node.body = [
+            *prefix,
+            *self.timed('_mp_token', body, 'leave_function',
+                        Constant(value=self.key)),
+        ]
+        fct_node.decorator_list = []
+        return fct_node
+
+### Profiler
+
+class CaseProfiler:
+
+    """ Collect case hit counts and timings of instrumented functions.
+
+        sample_rate is the fraction of executions (of functions and
+        match statements) which are measured; hit counts in snapshots
+        are extrapolated accordingly. It has to be in the range
+        (0, 1].
+
+    """
+    def __init__(self, sample_rate=1.0):
+        if not 0 < sample_rate <= 1:
+            raise ValueError(
+                f'sample_rate has to be in the range (0, 1]: '
+                f'{sample_rate!r}')
+        self.sample_rate = sample_rate
+        self.profile_name = f'__match_profile_{id(self)}__'
+        self.originals = {}
+        self.functions = {}
+        self.cases = {}
+
+    ### Instrumentation
+
+    def instrument(self, *fcts):
+
+        """ Instrument the functions fcts.
+
+            Functions using closures are not supported.
+
+        """
+        for fct in fcts:
+            if fct in self.originals:
+                continue
+            if fct.__code__.co_freevars:
+                raise ValueError(
+                    f'cannot instrument closure {fct.__qualname__}')
+            key = function_key(fct)
+            (lines, start_lineno) = inspect.getsourcelines(fct)
+            tree = ast.parse(textwrap.dedent(''.join(lines)))
+            ast.increment_lineno(tree, start_lineno - 1)
+            instrumenter = MatchInstrumenter(self.profile_name, key)
+            instrumenter.instrument_function(tree.body[0])
+            ast.fix_missing_locations(tree)
+            if _debug:
+                print (ast.unparse(tree))
+            code = compile(tree, inspect.getsourcefile(fct), 'exec')
+            namespace = {}
+            exec(code, fct.__globals__, namespace)
+            fct.__globals__[self.profile_name] = self
+            self.originals[fct] = fct.__code__
+            fct.__code__ = namespace[fct.__name__].__code__
+
+    def uninstrument(self, *fcts):
+
+        """ Restore the original code of the functions fcts, or of all
+            instrumented functions, if no functions are given.
+
+        """
+        if not fcts:
+            fcts = list(self.originals)
+        for fct in fcts:
+            fct.__code__ = self.originals.pop(fct)
+        remaining_globals = {id(fct.__globals__) for fct in self.originals}
+        for fct in fcts:
+            if id(fct.__globals__) not in remaining_globals:
+                fct.__globals__.pop(self.profile_name, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.uninstrument()
+
+    ### Counters (called by the instrumented code)
+
+    def enter(self):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return None
+        return time.perf_counter()
+
+    def leave_case(self, key, match_lineno, arm_lineno, t0):
+        duration = time.perf_counter() - t0
+        counter = self.cases.get((key, match_lineno, arm_lineno))
+        if counter is None:
+            counter = self.cases[key, match_lineno, arm_lineno] = [0, 0.0]
+        counter[0] += 1
+        counter[1] += duration
+
+    def leave_function(self, key, t0):
+        duration = time.perf_counter() - t0
+        counter = self.functions.get(key)
+        if counter is None:
+            counter = self.functions[key] = [0, 0.0]
+        counter[0] += 1
+        counter[1] += duration
+
+    ### Results
+
+    def reset(self):
+        self.functions.clear()
+        self.cases.clear()
+
+    def snapshot(self):
+
+        """ Return a snapshot of the counters as dict.
+
+            The dict maps function keys (module.qualname) to dicts with
+            the entries calls, samples, time and matches. matches maps
+            the line numbers of the match statements to dicts mapping
+            the line numbers of the cases (or NO_MATCH) to dicts with
+            the entries hits, samples and time.
+
+            hits and calls are extrapolated from the samples using the
+            sample rate. Times are in seconds and only include sampled
+            executions.
+
+        """
+        def counter_dict(samples, duration, count_name):
+            return {
+                count_name: round(samples / self.sample_rate),
+                'samples': samples,
+                'time': duration,
+            }
+
+        functions = {}
+        for key, (samples, duration) in self.functions.items():
+            functions[key] = counter_dict(samples, duration, 'calls')
+            functions[key]['matches'] = {}
+        for (key, match_lineno, arm_lineno), (samples, duration) in sorted(
+                self.cases.items(), key=lambda x: (x[0][0], x[0][1],
+                                                   x[0][2] or 0)):
+            function = functions.setdefault(
+                key, counter_dict(0, 0.0, 'calls') | {'matches': {}})
+            arms = function['matches'].setdefault(match_lineno, {})
+            if arm_lineno is None:
+                arm_lineno = NO_MATCH
+            arms[arm_lineno] = counter_dict(samples, duration, 'hits')
+        return {
+            'sample_rate': self.sample_rate,
+            'functions': functions,
+        }
+
+    def to_json(self, **kws):
+        return json.dumps(self.snapshot(), **kws)
+
+    def case_hits(self, fct):
+
+        """ Return a dict mapping case line numbers of fct to hit
+            counts, as needed by match_ast.reorder_function().
+
+        """
+        key = function_key(fct)
+        hits = {}
+        for (case_key, match_lineno, arm_lineno), (samples, duration) in (
+                self.cases.items()):
+            if case_key == key and arm_lineno is not None:
+                hits[arm_lineno] = round(samples / self.sample_rate)
+        return hits
+
+### Helpers
+
+def function_key(fct):
+    return f'{fct.__module__}.{fct.__qualname__}'
+
+###
+
+if __name__ == '__main__':
+    import match_ast
+    import match_xml
+    tree = match_xml.tokenize_xml(match_xml.COUNTRY_DATA)
+    with CaseProfiler(sample_rate=0.5) as profiler:
+        profiler.instrument(match_xml.parse_countries_1)
+        for i in range(1000):
+            match_xml.parse_countries_1(tree)
+        print (profiler.to_json(indent=2))
+        hits = profiler.case_hits(match_xml.parse_countries_1)
+    print ()
+    print ('Reordered by case hits:')
+    print (match_ast.reorder_function(match_xml.parse_countries_1, hits))
@@ -4,7 +4,14 @@
 
 """
 
-from xml.etree.ElementTree import XML, Element, tostring
+import os
+from xml.etree.ElementTree import XML, XMLPullParser, Element, tostring
+from xml.parsers import expat
+
+### Globals
+
+# Number of bytes to read per chunk when streaming XML data
+STREAM_CHUNK_SIZE = 64 * 1024
 
 ### Demo data
 
@@ -40,6 +47,9 @@ COUNTRY_DATA = """\
 def error_string(elem, objtype='element'):
     return f'could not parse {objtype}: {tostring(elem, encoding="unicode")!r}'
 
+def tuple_error_string(obj, objtype='element'):
+    return f'could not parse {objtype}: {obj!r}'
+
 ### Functions
 
 def tokenize_xml(data):
@@ -168,6 +178,192 @@ def parse_countries_2(tree):
                                              'country'))
     return countries
 
+def stream_countries_2(source, chunk_size=STREAM_CHUNK_SIZE):
+
+    """ Streaming variant of parse_countries_2().
+
+        source may be a file path or a binary stream. The data is fed
+        to the XML parser in chunks of chunk_size bytes and each
+        <country> element is matched as soon as it has been parsed
+        completely. It is then dropped from the tree, so that memory
+        use stays flat regardless of the input size.
+
+        Yields (name, record) tuples, with record being the same dict
+        as used by parse_countries_2().
+
+    """
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, 'rb') as file:
+            yield from stream_countries_2(file, chunk_size)
+        return
+
+    parser = XMLPullParser(events=('start', 'end'))
+    root = None
+    depth = 0
+    while True:
+        data = source.read(chunk_size)
+        if data:
+            parser.feed(data)
+        else:
+            parser.close()
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                # Only look at the top-level children
+                continue
+            # Match using parse_countries_2() with a one element tree
+            name, record = next(iter(parse_countries_2((elem,)).items()))
+            # Free the processed element (and everything before it)
+            root.clear()
+            yield name, record
+        if not data:
+            break
+
+### Expat engine
+
+# The expat engine does not build an ElementTree. Instead, it assembles
+# lightweight tuples for each top-level element:
+#
+#   (tag, attrib, children)
+#
+# with children being a list of (tag, attrib, text) tuples for the
+# direct child elements. text is the character data before the first
+# grandchild (or None), just like Element.text. Namespaced tags and
+# attribute names use the {uri}name notation of ElementTree.
+
+def parse_country_tuple(country):
+
+    """ Parse a country tuple as created by parse_countries_expat().
+
+        Returns a tuple (name, record), record being the same dict as
+        used by parse_countries_2().
+
+    """
+    match country:
+        case ('country', {'name': name}, [
+                ('rank', _, rank),
+                ('year', _, year),
+                ('gdppc', _, gdppc),
+                *extra,
+                ]):
+            # Convert types
+            rank = int(rank)
+            year = int(year)
+            gdppc = float(gdppc)
+            # Parse neighbors
+            neighbors = {}
+            for child in extra:
+                match child:
+                    case ('neighbor',
+                          {'name': nb_name, 'direction': nb_direction},
+                          _):
+                        neighbors[nb_name] = nb_direction
+                    case wrong_data:
+                        raise TypeError(
+                            tuple_error_string(
+                                wrong_data,
+                                'neighbor'))
+        case ('country', {'name': name}, _):
+            raise TypeError(tuple_error_string(
+                    country,
+                    'country elements'))
+        case wrong_data:
+            raise TypeError(tuple_error_string(wrong_data,
+                                               'country'))
+    return name, dict(
+        rank=rank,
+        year=year,
+        gdppc=gdppc,
+        neighbors=neighbors,
+    )
+
+def parse_countries_expat(source):
+
+    """ Variant of parse_countries_2() driven by expat callbacks.
+
+        source may be XML data (str or bytes) or a binary stream. The
+        top-level elements are assembled into tuples (see above) and
+        matched using parse_country_tuple() as soon as they are
+        complete, without building an ElementTree.
+
+        Returns the same dict as parse_countries_2() for the parsed
+        tree. Invalid data raises a TypeError (with a message showing
+        the tuple instead of the XML) or ValueError.
+
+    """
+    countries = {}
+    depth = 0
+    country = None
+    child = None
+    text = []
+    # Collect the text of the current child element ? This stops at
+    # the first grandchild, like Element.text
+    in_text = False
+
+    # Cache of the names converted by fixname()
+    names = {}
+
+    def fixname(name):
+        # Use the {uri}name notation of ElementTree for namespaced names
+        try:
+            return names[name]
+        except KeyError:
+            fixed = names[name] = '{' + name if '}' in name else name
+            return fixed
+
+    def start_element(tag, attrib):
+        nonlocal depth, country, child, in_text
+        tag = fixname(tag)
+        if attrib:
+            attrib = {fixname(key): value
+                      for key, value in attrib.items()}
+        depth += 1
+        if depth == 2:
+            country = (tag, attrib, [])
+        elif depth == 3:
+            child = [tag, attrib, None]
+            text.clear()
+            in_text = True
+        elif depth == 4 and in_text:
+            # Text before the first grandchild
+            if text:
+                child[2] = ''.join(text)
+            in_text = False
+
+    def end_element(tag):
+        nonlocal depth, country, child, in_text
+        if depth == 3:
+            if in_text and text:
+                child[2] = ''.join(text)
+            in_text = False
+            country[2].append(tuple(child))
+            child = None
+        elif depth == 2:
+            name, record = parse_country_tuple(country)
+            countries[name] = record
+            country = None
+        depth -= 1
+
+    def character_data(data):
+        if depth == 3 and in_text:
+            text.append(data)
+
+    parser = expat.ParserCreate(namespace_separator='}')
+    parser.buffer_text = True
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = character_data
+    if hasattr(source, 'read'):
+        parser.ParseFile(source)
+    else:
+        parser.Parse(source, True)
+    return countries
+
 ###
 
 if __name__ == '__main__':
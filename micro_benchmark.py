@@ -9,14 +9,44 @@
     an example how to define micro- benchmarks.  Each such script will
     provide the same interface as this one when using the run() function.
 
+    Suites: Use "micro_benchmark.py --mb-suite DIR -o FILE" to run the
+    benchmarks of all bench_*.py modules in DIR in one session and write
+    the results to a single file.
+
     Written by Marc-Andre Lemburg.
     Copyright (c) 2024, eGenix.com Software GmbH; mailto:info@egenix.com
     License: Apache-2.0
 
 """
+import argparse
+import collections
+import contextlib
+import cProfile
+import difflib
+import dis
+import gc
+import glob
+import hashlib
+import importlib
+import importlib.util
 import inspect
+import itertools
+import json
+import marshal
+import math
+import opcode
+import os
+import pstats
+import random
 import re
+import sqlite3
+import statistics
+import subprocess
+import sys
 import textwrap
+import threading
+import time
+import tracemalloc
 import pyperf
 
 ### Globals
@@ -28,6 +58,22 @@ _debug = 0
 # function
 DEFAULT_ITERATIONS = 20
 
+# Maximum number of copies used by the auto calibration
+MAX_ITERATIONS = 100
+
+# Target time for running the (unrolled) benchmark_code part once, used by
+# the auto calibration to determine the number of copies
+CALIBRATION_UNROLL_TIME = 1e-6
+
+# Minimum time to spend on measuring the benchmark during calibration
+CALIBRATION_TIME = 0.01
+
+# Strategies for repeating the benchmark_code part: "unroll" puts
+# iterations copies of the code into the function, "loop" runs a single
+# copy in an inner loop
+STRATEGIES = ('unroll', 'loop')
+DEFAULT_STRATEGY = 'unroll'
+
 # Code template used to build the benchmark functions
 PERF_TEMPLATE = """\
 def {fct_name}(iterations):
@@ -42,6 +88,158 @@ def {fct_name}(iterations):
     return t1 - t0
 """
 
+# Code template used to build the benchmark functions for the "loop"
+# strategy
+PERF_LOOP_TEMPLATE = """\
+def {fct_name}(iterations):
+    loops = range(iterations)
+    inner_loops = range({inner_loops})
+    counter = pyperf.perf_counter
+    t0 = counter()
+{init_code}
+    for _ in loops:
+        for _ in inner_loops:
+{benchmark_code}
+    t1 = counter()
+{verify_code}
+    return t1 - t0
+"""
+
+# Code template used to build the memory measurement functions, see
+# measure_memory()
+MEMORY_TEMPLATE = """\
+def {fct_name}(iterations):
+    loops = range(iterations)
+{init_code}
+    memory_begin()
+    for _ in loops:
+{benchmark_code}
+    memory_end()
+{verify_code}
+"""
+
+# Result of running a benchmark: family is the benchmark name without
+# parameters, params the parameter dict (or None), bench the
+# pyperf.Benchmark, group the comparison group (or None) and fct the
+# benchmark function
+BenchmarkResult = collections.namedtuple(
+    'BenchmarkResult', ('family', 'params', 'bench', 'group', 'fct'))
+
+# Relative growth of the time over all sizes below which the time of a
+# parametrized benchmark is considered constant
+SCALING_CONSTANT_TOLERANCE = 0.1
+
+# z value for 95% confidence intervals
+Z_95 = 1.96
+
+# Student t values for 95% confidence intervals, indexed by degrees of
+# freedom (1..30); see t_95()
+T_95 = (
+    None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306,
+    2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110,
+    2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056,
+    2.052, 2.048, 2.045, 2.042,
+)
+
+# Default directory for storing baselines
+DEFAULT_BASELINE_DIR = 'mb-baselines'
+
+# Default maximum slowdown accepted when checking against a baseline
+DEFAULT_MAX_SLOWDOWN = 0.05
+
+# Default relative change of the mean flagged as change point in the
+# benchmark history
+DEFAULT_CHANGE_THRESHOLD = 0.05
+
+# Schema of the benchmark history database
+HISTORY_SCHEMA = """\
+create table if not exists results (
+    id integer primary key,
+    timestamp text,
+    name text,
+    family text,
+    params text,
+    mean real,
+    stdev real,
+    nvalues integer,
+    python text,
+    implementation text,
+    cpu text,
+    hostname text,
+    iterations integer,
+    source_hash text,
+    git_commit text
+)
+"""
+
+# Adaptive mode defaults: target relative width of the 95% confidence
+# interval of the mean and minimum/maximum number of samples
+DEFAULT_TARGET_WIDTH = 0.05
+DEFAULT_MIN_SAMPLES = 10
+DEFAULT_MAX_SAMPLES = 500
+
+# Number of samples taken to measure the loop overhead, see
+# measure_overhead()
+OVERHEAD_SAMPLES = 10
+
+# Garbage collector modes used while running the benchmarks: "default"
+# leaves the GC alone, "disabled" disables it, "collect" runs a full
+# collection before each sample and "freeze" moves all objects existing
+# at the start of a sample into the permanent generation (gc.freeze())
+GC_MODES = ('default', 'disabled', 'collect', 'freeze')
+DEFAULT_GC_MODE = 'default'
+
+# Number of samples taken to measure the process CPU time, see
+# measure_cpu_time()
+CPU_TIME_SAMPLES = 10
+
+# Length of the input sequence built from the corpus for benchmarks with
+# input rotation, and the random seed used for shuffling it, see
+# rotation_sequence()
+ROTATION_LENGTH = 1000
+ROTATION_SEED = 42
+
+# Number of loops to run a benchmark function for, before inspecting the
+# specialized bytecode, see inspect_bytecode()
+DIS_WARMUP_LOOPS = 1000
+
+# Default number of loops to run under the profiler and number of
+# hotspots to print, see profile_benchmark()
+DEFAULT_PROFILE_LOOPS = 1000
+PROFILE_TOP = 10
+
+# Number of measurements per thread count in throughput mode, see
+# run_throughput()
+THROUGHPUT_REPEAT = 5
+
+# Iterations determined by the auto calibration, per benchmark name; the
+# main process passes these on to the workers
+_calibrations = {}
+
+# Memory statistics measured by the main process, per benchmark name;
+# these are passed on to the workers as metadata
+_memory_stats = {}
+
+# Loop overhead per iteration in seconds measured by the main process,
+# per benchmark name; these are passed on to the workers as metadata
+_overheads = {}
+
+# Process CPU and wall time per iteration in seconds measured by the main
+# process, per benchmark name; these are passed on to the workers as
+# metadata
+_cpu_times = {}
+
+# Mix of the corpus inputs to use for all benchmarks with input rotation,
+# overriding the configured mix; set by --mb-mix
+_mix = None
+
+# Cache the compiled benchmark code on disk ?
+_use_code_cache = True
+
+# Directory to use for the code cache; None means: use the __pycache__
+# directory next to the source file of the benchmark function
+_code_cache_dir = None
+
 ### Examples
 
 # Example bench mark function:
@@ -73,20 +271,61 @@ def bench_match_int():
 
 ### Tools
 
-def benchmark_code(fct, iterations=DEFAULT_ITERATIONS, fct_name=None):
+def benchmark_code(fct, iterations=DEFAULT_ITERATIONS, fct_name=None,
+                   strategy=DEFAULT_STRATEGY, template=None, params=None,
+                   empty=False):
 
     if fct_name is None:
         fct_name = fct.__name__
+    rotate, mix = rotation_config(fct)
     if _debug:
         print (f'generating benchmark code for {fct}')
     (lines, start_lineno) = inspect.getsourcelines(fct)
     if _debug:
         print (f'inspect code lines: {lines}')
+    return source_benchmark_code(lines, iterations=iterations,
+                                 fct_name=fct_name, strategy=strategy,
+                                 template=template, params=params,
+                                 empty=empty, rotate=rotate, mix=mix)
+
+def source_benchmark_code(lines, iterations=DEFAULT_ITERATIONS, fct_name=None,
+                          strategy=DEFAULT_STRATEGY, template=None,
+                          params=None, empty=False, rotate=None, mix=None):
+
+    """ Build the benchmark function code from the source code lines of
+        a bench function definition.
+
+        This is used by benchmark_code(), but can also be used to build
+        benchmarks from generated source code. fct_name defaults to
+        the name of the defined function.
+
+        strategy defines how the benchmark_code part is repeated
+        iterations times, see STRATEGIES. template may be given to
+        override the code template for the "unroll" strategy.
+
+        params may be given as dict mapping variable names to values.
+        These variables are defined at the start of the Init section.
+
+        If empty is true, the Bench section is replaced with a pass
+        statement and the Verify section is left out. This is used for
+        measuring the loop overhead of the benchmark function.
+
+        rotate may be given as name of the variable the Bench section
+        works on. The Init section then has to define a list corpus of
+        inputs and the variable is set to the next input taken from
+        the corpus before each run of the Bench section. mix may be
+        given as list of weights for the corpus entries, see
+        rotation_sequence().
+
+    """
+    lines = list(lines)
 
     # Remove decorators and def
     while lines[0].startswith('@'):
         del lines[0]
     assert lines[0].startswith('def')
+    if fct_name is None:
+        fct_name = lines[0][3:].split('(')[0].strip()
     del lines[0]
 
     # Remove empty lines
@@ -117,41 +356,381 @@ def benchmark_code(fct, iterations=DEFAULT_ITERATIONS, fct_name=None):
             continue
         add_to.append(line)
     assert len(junk) == 0, f'found extra code: {junk}'
+    if empty:
+        bench = ['pass\n']
+        verify = []
+    if rotate:
+        init = init + [
+            f'_mb_inputs = itertools.cycle(rotation_sequence(corpus, '
+            f'{mix!r}))\n']
+        if empty:
+            bench = []
+        bench = [f'{rotate} = next(_mb_inputs)\n'] + bench
+    if params:
+        init = [f'{name} = {value!r}\n'
+                for name, value in params.items()] + init
 
     init_code = ''.join((
         f'    {line}' for line in init))
-    benchmark_code = ''.join((
-        f'        {line}' for line in bench * iterations))
     verify_code = ''.join((
         f'    {line}' for line in verify))
 
     # Build benchmark function
-    code = PERF_TEMPLATE.format(
-        fct_name=fct.__name__,
-        init_code=init_code.rstrip(),
-        benchmark_code=benchmark_code.rstrip(),
-        verify_code=verify_code.rstrip(),
-        )
+    if strategy == 'unroll':
+        benchmark_code = ''.join((
+            f'        {line}' for line in bench * iterations))
+        code = (template or PERF_TEMPLATE).format(
+            fct_name=fct_name,
+            init_code=init_code.rstrip(),
+            benchmark_code=benchmark_code.rstrip(),
+            verify_code=verify_code.rstrip(),
+            )
+    elif strategy == 'loop':
+        benchmark_code = ''.join((
+            f'            {line}' for line in bench))
+        code = PERF_LOOP_TEMPLATE.format(
+            fct_name=fct_name,
+            inner_loops=iterations,
+            init_code=init_code.rstrip(),
+            benchmark_code=benchmark_code.rstrip(),
+            verify_code=verify_code.rstrip(),
+            )
+    else:
+        raise ValueError(f'unknown benchmark strategy: {strategy!r}')
 
     return fct_name, code
 
-def benchmark_function(fct, iterations=DEFAULT_ITERATIONS, fct_name=None):
+def benchmark_function(fct, iterations=DEFAULT_ITERATIONS, fct_name=None,
+                       strategy=DEFAULT_STRATEGY, params=None):
+
+    # Note: pyperf uses worker processes which need to rerun the code
+    # generation upon startup, so we try to load the code from the
+    # code cache first
+    if fct_name is None:
+        fct_name = fct.__name__
+    if _use_code_cache:
+        (lines, start_lineno) = inspect.getsourcelines(fct)
+        rotate, mix = rotation_config(fct)
+        cache_file = code_cache_file(fct, fct_name, params)
+        cache_key = code_cache_key(lines, iterations, fct_name, strategy,
+                                   params, rotate, mix)
+        code_object = load_cached_code(cache_file, cache_key)
+        if code_object is None:
+            fct_name, code = source_benchmark_code(
+                lines, iterations=iterations, fct_name=fct_name,
+                strategy=strategy, params=params, rotate=rotate, mix=mix)
+            code_object = compile(code, '<generated>', 'exec')
+            store_cached_code(cache_file, cache_key, code_object)
+        elif _debug:
+            print (f'loaded {fct_name} from code cache {cache_file}')
+        return define_benchmark(fct_name, code_object)
 
     # Generate code
-    fct_name, code = benchmark_code(fct, iterations=iterations, fct_name=fct_name)
+    fct_name, code = benchmark_code(fct, iterations=iterations, fct_name=fct_name,
+                                    strategy=strategy, params=params)
+    return compile_benchmark(fct_name, code)
+
+def compile_benchmark(fct_name, code):
 
-    # Note: pyperf uses worker processes which need to rerun the code
-    # generation upon startup
     bench_fct = compile(code, '<generated>', 'exec')
-    exec(bench_fct, globals(), globals())
     if _debug:
-        print ('Built and defined global function:')
+        print ('Built global function:')
         print (code)
         print ()
+    return define_benchmark(fct_name, bench_fct)
+
+def define_benchmark(fct_name, code_object):
+
+    exec(code_object, globals(), globals())
+    if _debug:
+        print (f'Defined global function {fct_name}')
     return globals()[fct_name]
 
+### Input rotation
+
+def rotation_config(fct):
+
+    """ Return the input rotation configuration (rotate, mix) of the
+        benchmark function fct, see configure().
+
+        The mix given with --mb-mix overrides the configured one.
+
+    """
+    rotate = getattr(fct, 'rotate', None)
+    if not rotate:
+        return None, None
+    if _mix is not None:
+        return rotate, _mix
+    return rotate, getattr(fct, 'mix', None)
+
+def rotation_sequence(corpus, mix=None, length=ROTATION_LENGTH,
+                      seed=ROTATION_SEED):
+
+    """ Return a list of about length inputs taken from corpus.
+
+        mix may be given as list of weights for the corpus entries
+        (default: equal weights). Entries are repeated according to
+        their weight and the list is shuffled using a fixed seed, so
+        that the order is not predictable, but the same for all runs.
+
+    """
+    if mix is None:
+        mix = [1] * len(corpus)
+    if len(mix) != len(corpus):
+        raise ValueError(f'mix {mix!r} does not match the corpus size '
+                         f'{len(corpus)}')
+    total = sum(mix)
+    sequence = []
+    for entry, weight in zip(corpus, mix):
+        if weight > 0:
+            sequence.extend([entry] * max(1, round(length * weight / total)))
+    random.Random(seed).shuffle(sequence)
+    return sequence
+
+### Code cache
+
+def code_cache_file(fct, fct_name, params=None):
+
+    """ Return the path of the code cache file for the benchmark function
+        fct, built as fct_name using params.
+
+    """
+    source_file = inspect.getsourcefile(fct)
+    if _code_cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(source_file), '__pycache__')
+    else:
+        cache_dir = _code_cache_dir
+    module_name = os.path.splitext(os.path.basename(source_file))[0]
+    if params:
+        params_hash = hashlib.sha256(repr(params).encode('utf-8'))
+        fct_name = f'{fct_name}-{params_hash.hexdigest()[:16]}'
+    return os.path.join(
+        cache_dir,
+        f'{module_name}.{fct_name}.{sys.implementation.cache_tag}.mbc')
+
+def tool_hash():
+
+    """ Return a hash of this module, so that cached code is invalidated
+        whenever the code generator changes.
+
+    """
+    with open(__file__, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def code_cache_key(lines, iterations, fct_name, strategy, params=None,
+                   rotate=None, mix=None):
+
+    """ Return the cache key for the benchmark code generated from the
+        source code lines with the given parameters.
+
+        The key also covers the Python version, the code templates and
+        this module (see tool_hash()), so that the cache is invalidated
+        whenever any of these change.
+
+    """
+    data = repr((
+        ''.join(lines),
+        iterations,
+        fct_name,
+        strategy,
+        params,
+        rotate,
+        mix,
+        PERF_TEMPLATE,
+        PERF_LOOP_TEMPLATE,
+        tool_hash(),
+        sys.version,
+        importlib.util.MAGIC_NUMBER,
+    ))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest().encode('ascii')
+
+def load_cached_code(cache_file, cache_key):
+
+    """ Load the code object stored under cache_key from cache_file.
+
+        Returns None, if the file is missing or stores a different key.
+
+    """
+    try:
+        with open(cache_file, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    key, _, marshalled_code = data.partition(b'\n')
+    if key != cache_key:
+        return None
+    try:
+        return marshal.loads(marshalled_code)
+    except (EOFError, ValueError, TypeError):
+        return None
+
+def store_cached_code(cache_file, cache_key, code_object):
+
+    """ Store code_object under cache_key in cache_file.
+
+        Errors are ignored, since the cache is only an optimization.
+
+    """
+    temp_file = f'{cache_file}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(temp_file, 'wb') as file:
+            file.write(cache_key + b'\n' + marshal.dumps(code_object))
+        os.replace(temp_file, cache_file)
+    except OSError as error:
+        if _debug:
+            print (f'could not write code cache {cache_file}: {error}')
+
+# State used by the memory measurement functions
+_memory_state = {}
+
+def memory_begin():
+    _memory_state['snapshot0'] = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    _memory_state['current0'] = tracemalloc.get_traced_memory()[0]
+
+def memory_end():
+    _memory_state['peak'] = tracemalloc.get_traced_memory()[1]
+    _memory_state['snapshot1'] = tracemalloc.take_snapshot()
+
+def measure_memory(fct, params=None):
+
+    """ Measure the memory allocations of the Bench section of the
+        benchmark function fct using tracemalloc.
+
+        Returns a dict with the entries mb_alloc_blocks and
+        mb_alloc_bytes, giving the number of memory blocks and bytes
+        allocated by one iteration which are still alive at its end
+        (e.g. for capture variables), and mb_peak_bytes, giving the
+        peak memory use during the iteration (including temporary
+        allocations).
+
+    """
+    fct_name, code = benchmark_code(
+        fct, iterations=1, fct_name=f'{fct.__name__}_memory',
+        template=MEMORY_TEMPLATE, params=params)
+    memory_fct = compile_benchmark(fct_name, code)
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        # Warm up, to exclude one-time allocations
+        memory_fct(1)
+        memory_fct(1)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    # Only look at allocations made by the generated code
+    generated_filter = (tracemalloc.Filter(True, '<generated>'),)
+    snapshot0 = _memory_state['snapshot0'].filter_traces(generated_filter)
+    snapshot1 = _memory_state['snapshot1'].filter_traces(generated_filter)
+    stats = snapshot1.compare_to(snapshot0, 'filename')
+    return {
+        'mb_alloc_blocks': sum(stat.count_diff for stat in stats),
+        'mb_alloc_bytes': sum(stat.size_diff for stat in stats),
+        'mb_peak_bytes': max(0, _memory_state['peak'] -
+                                _memory_state['current0']),
+    }
+
+def measure_overhead(fct, iterations=DEFAULT_ITERATIONS,
+                     strategy=DEFAULT_STRATEGY, params=None):
+
+    """ Measure the loop overhead of the benchmark function fct.
+
+        This runs a benchmark function with the same Init section and
+        the same number of iterations, but an empty Bench section, and
+        returns the median time per iteration in seconds. This time
+        includes the loop and template overhead, which is part of the
+        time measured by the benchmark function.
+
+    """
+    fct_name, code = benchmark_code(
+        fct, iterations=iterations, fct_name=f'{fct.__name__}_overhead',
+        strategy=strategy, params=params, empty=True)
+    overhead_fct = compile_benchmark(fct_name, code)
+    loops = 1
+    while overhead_fct(loops) < CALIBRATION_TIME:
+        loops *= 2
+    values = [overhead_fct(loops) / (loops * iterations)
+              for i in range(OVERHEAD_SAMPLES)]
+    return statistics.median(values)
+
+def calibrate_benchmark(fct, strategy=DEFAULT_STRATEGY, target_time=0.1,
+                        params=None):
+
+    """ Determine the iterations and outer loops to use for the benchmark
+        function fct.
+
+        For the "unroll" strategy, iterations is chosen so that one pass
+        through the unrolled code takes about CALIBRATION_UNROLL_TIME
+        (limited to MAX_ITERATIONS copies). For the "loop" strategy,
+        only the outer loops are calibrated.
+
+        loops is chosen so that one sample (a call of the benchmark
+        function) takes about target_time seconds.
+
+        Returns a tuple (iterations, loops).
+
+    """
+    bench_fct = benchmark_function(
+        fct, iterations=1, fct_name=f'{fct.__name__}_calibration',
+        strategy='loop', params=params)
+
+    # Measure time for running the bench code once
+    loops = 1
+    while True:
+        duration = bench_fct(loops)
+        if duration >= CALIBRATION_TIME:
+            break
+        loops *= 2
+    bench_time = duration / loops
+
+    if strategy == 'unroll':
+        iterations = round(CALIBRATION_UNROLL_TIME / bench_time)
+        iterations = max(1, min(MAX_ITERATIONS, iterations))
+    else:
+        iterations = DEFAULT_ITERATIONS
+    loops = max(1, math.ceil(target_time / (iterations * bench_time)))
+    if _debug:
+        print (f'calibrated {fct.__name__}: {bench_time * 1e9:.1f} ns '
+               f'per run, iterations {iterations}, loops {loops}')
+    return iterations, loops
+
+def param_grid(params):
+
+    """ Return a list of dicts with all combinations of the parameter
+        values given in params (mapping names to lists of values).
+
+    """
+    names = list(params)
+    return [dict(zip(names, values))
+            for values in itertools.product(*params.values())]
+
+def param_benchmark_name(benchmark_name, params):
+    if not params:
+        return benchmark_name
+    point = ','.join(f'{name}={value!r}' for name, value in params.items())
+    return f'{benchmark_name}[{point}]'
+
 def run_benchmark(runner, fct):
 
+    """ Run the benchmark function fct using runner.
+
+        If fct has parameters defined (see configure()), one benchmark
+        is run per parameter combination.
+
+    """
+    if hasattr(fct, 'params'):
+        for params in param_grid(fct.params):
+            run_benchmark_point(runner, fct, params)
+    else:
+        run_benchmark_point(runner, fct)
+    return runner
+
+def run_benchmark_point(runner, fct, params=None):
+
+    args = runner.args
     if hasattr(fct, 'iterations'):
         iterations = fct.iterations
     else:
@@ -160,17 +739,1175 @@ def run_benchmark(runner, fct):
         benchmark_name = fct.name
     else:
         benchmark_name = fct.__name__
-    bench_fct = benchmark_function(fct, iterations=iterations)
+    family_name = benchmark_name
+    benchmark_name = param_benchmark_name(benchmark_name, params)
+    if hasattr(fct, 'strategy'):
+        strategy = fct.strategy
+    else:
+        strategy = args.mb_strategy or DEFAULT_STRATEGY
+
+    # Auto calibration (only done in the main process)
+    loops = None
+    calibrate = iterations == 'auto' or args.mb_calibrate
+    if calibrate:
+        if args.worker:
+            iterations = _calibrations.get(benchmark_name, DEFAULT_ITERATIONS)
+        else:
+            target_time = args.mb_target_time or args.min_time
+            iterations, loops = calibrate_benchmark(
+                fct, strategy=strategy, target_time=target_time,
+                params=params)
+            _calibrations[benchmark_name] = iterations
+
+    # Bytecode inspection (replaces running the benchmark)
+    if args.mb_dis:
+        listing = inspect_bytecode(fct, strategy=strategy, params=params)
+        print_bytecode(benchmark_name, listing)
+        runner.mb_listings.append(
+            (benchmark_name, getattr(fct, 'group', None), listing))
+        return None
+
+    # Memory measurement (only done in the main process)
+    memory = getattr(fct, 'memory', False) or args.mb_memory
+    if memory and not args.worker:
+        _memory_stats[benchmark_name] = measure_memory(fct, params)
+
+    # Loop overhead measurement (only done in the main process)
+    if not args.mb_no_overhead and not args.worker:
+        _overheads[benchmark_name] = measure_overhead(
+            fct, iterations=iterations, strategy=strategy, params=params)
+
+    bench_fct = benchmark_function(fct, iterations=iterations,
+                                   strategy=strategy, params=params)
     if _debug:
         print (bench_fct)
-    runner.bench_time_func(benchmark_name, bench_fct, inner_loops=iterations)
-    return runner
+    gc_mode = getattr(fct, 'gc', None) or args.mb_gc or DEFAULT_GC_MODE
+    time_fct = gc_time_function(bench_fct, gc_mode)
+
+    # CPU time measurement (only done in the main process)
+    if not args.worker:
+        _cpu_times[benchmark_name] = measure_cpu_time(bench_fct, iterations,
+                                                      gc_mode)
+
+    metadata = {
+        'mb_strategy': strategy,
+        'mb_iterations': iterations,
+        'mb_code_size': len(bench_fct.__code__.co_code),
+        'mb_gil_enabled': str(gil_enabled()),
+        'mb_gc': gc_mode,
+    }
+    if benchmark_name in _cpu_times:
+        metadata.update(_cpu_times[benchmark_name])
+    if args.mb_suite:
+        metadata['mb_module'] = fct.__module__
+    if memory and benchmark_name in _memory_stats:
+        metadata.update(_memory_stats[benchmark_name])
+    if benchmark_name in _overheads:
+        metadata['mb_overhead'] = _overheads[benchmark_name]
+    rotate, mix = rotation_config(fct)
+    if rotate:
+        metadata['mb_rotate'] = rotate
+        if mix is not None:
+            metadata['mb_mix'] = ','.join(str(weight) for weight in mix)
+    if (calibrate or args.verbose) and not (args.worker or args.quiet):
+        print (f'{benchmark_name}: strategy {strategy}, '
+               f'iterations {iterations}, '
+               f'loops {loops or args.loops or "(pyperf calibrated)"}, '
+               f'code size {metadata["mb_code_size"]} bytes')
+
+    if args.mb_threads:
+        # Measure the throughput of 1..N threads in the main process
+        bench = None
+        run_throughput(runner, benchmark_name, time_fct, iterations,
+                       loops=args.loops or loops, metadata=metadata)
+    elif args.mb_adaptive:
+        # Sample in the main process until the result is stable
+        bench = run_adaptive(runner, benchmark_name, time_fct, iterations,
+                             loops=args.loops or loops, metadata=metadata)
+    else:
+        # Use calibrated loops, unless given on the command line
+        old_loops = args.loops
+        if loops and not old_loops and not args.worker:
+            args.loops = loops
+        try:
+            bench = runner.bench_time_func(benchmark_name, time_fct,
+                                           inner_loops=iterations,
+                                           metadata=metadata)
+        finally:
+            args.loops = old_loops
+    if bench is not None:
+        runner.mb_results.append(BenchmarkResult(
+            family_name, params, bench, getattr(fct, 'group', None), fct))
+    if args.mb_profile and not args.worker:
+        # Profile outside of the timed runs
+        profile_benchmark(benchmark_name, bench_fct, iterations,
+                          args.mb_profile,
+                          args.mb_profile_loops or DEFAULT_PROFILE_LOOPS)
+    if (bench is not None and benchmark_name in _overheads and
+        not args.worker):
+        print_net_time(benchmark_name, bench, _overheads[benchmark_name])
+    if bench is not None and not args.worker:
+        print_cpu_time(benchmark_name, bench, _cpu_times[benchmark_name])
+    if memory and not args.worker:
+        print (f'{benchmark_name}: Memory per iteration: '
+               f'{metadata["mb_alloc_blocks"]} blocks, '
+               f'{metadata["mb_alloc_bytes"]} bytes allocated, '
+               f'peak {metadata["mb_peak_bytes"]} bytes')
+    return bench
+
+def print_net_time(benchmark_name, bench, overhead):
+    mean = bench.mean()
+    print (f'{benchmark_name}: Net time: '
+           f'{bench.format_value(mean - overhead)} '
+           f'(raw {bench.format_value(mean)} - '
+           f'loop overhead {bench.format_value(overhead)})')
+
+### GC and CPU time
+
+@contextlib.contextmanager
+def gc_context(mode=DEFAULT_GC_MODE):
+
+    """ Context manager to set up the garbage collector mode mode (see
+        GC_MODES) for running a benchmark sample.
+
+    """
+    if mode == 'default':
+        yield
+    elif mode == 'disabled':
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            yield
+        finally:
+            if enabled:
+                gc.enable()
+    elif mode == 'collect':
+        gc.collect()
+        yield
+    elif mode == 'freeze':
+        gc.freeze()
+        try:
+            yield
+        finally:
+            gc.unfreeze()
+    else:
+        raise ValueError(f'unknown GC mode: {mode!r}')
+
+def gc_time_function(bench_fct, mode=DEFAULT_GC_MODE):
+
+    """ Return a function wrapping bench_fct, which runs it using the
+        garbage collector mode mode (see GC_MODES).
+
+        The GC handling is done outside of the timed code of bench_fct.
+
+    """
+    if mode == 'default':
+        return bench_fct
+    if mode not in GC_MODES:
+        raise ValueError(f'unknown GC mode: {mode!r}')
+    def time_fct(loops):
+        with gc_context(mode):
+            return bench_fct(loops)
+    time_fct.__name__ = bench_fct.__name__
+    return time_fct
+
+def measure_cpu_time(bench_fct, iterations, mode=DEFAULT_GC_MODE):
+
+    """ Measure the process CPU time and the wall clock time per
+        iteration of the benchmark function bench_fct, using the
+        garbage collector mode mode.
+
+        Returns a dict with the entries mb_cpu_time and mb_wall_time
+        (in seconds, medians of CPU_TIME_SAMPLES samples).
+
+    """
+    loops = 1
+    while bench_fct(loops) < CALIBRATION_TIME:
+        loops *= 2
+    cpu_times = []
+    wall_times = []
+    for i in range(CPU_TIME_SAMPLES):
+        with gc_context(mode):
+            t0 = time.process_time()
+            duration = bench_fct(loops)
+            cpu_duration = time.process_time() - t0
+        wall_times.append(duration / (loops * iterations))
+        cpu_times.append(cpu_duration / (loops * iterations))
+    return {
+        'mb_cpu_time': statistics.median(cpu_times),
+        'mb_wall_time': statistics.median(wall_times),
+    }
+
+def print_cpu_time(benchmark_name, bench, cpu_times):
+    cpu_time = cpu_times['mb_cpu_time']
+    wall_time = cpu_times['mb_wall_time']
+    print (f'{benchmark_name}: CPU time: {bench.format_value(cpu_time)} '
+           f'(wall time {bench.format_value(wall_time)}, '
+           f'{cpu_time / wall_time:.0%} CPU)')
+
+### Bytecode
+
+def section_line_range(code):
+
+    """ Return the range of line numbers of the Bench section in the
+        generated benchmark function code.
+
+    """
+    lines = code.splitlines()
+    end = lines.index('    t1 = counter()')
+    start = max(i
+                for i, line in enumerate(lines[:end])
+                if line.lstrip().startswith('for _ in '))
+    # Line numbers are 1-based
+    return range(start + 2, end + 1)
+
+def specialization_families():
+
+    """ Return the set of names of the instructions which the adaptive
+        interpreter can specialize (Python 3.11+).
+
+        Instructions which only have superinstructions as
+        specializations (e.g. LOAD_FAST__LOAD_CONST) are not included,
+        since these are not expected to always get specialized.
+
+    """
+    specializations = getattr(opcode, '_specializations', None)
+    if specializations is None:
+        try:
+            from _opcode_metadata import _specializations as specializations
+        except ImportError:
+            return set()
+    return set(family
+               for family, names in specializations.items()
+               if any('__' not in name for name in names))
+
+def unspecialized_flags(opnames):
+
+    """ Return a list of flags for the adaptive instruction names
+        opnames, which are true for instructions which were not
+        specialized.
+
+    """
+    families = specialization_families()
+    flags = []
+    previous = ''
+    for opname in opnames:
+        if (opname.startswith('CALL') and
+            previous.startswith('PRECALL_') and
+            previous != 'PRECALL_ADAPTIVE'):
+            # Python 3.11: specialized PRECALL instructions run the call
+            # themselves and skip the following CALL
+            flags.append(False)
+        else:
+            flags.append(opname in families or opname.endswith('_ADAPTIVE'))
+        previous = opname
+    return flags
+
+def section_instructions(bench_fct, lines, adaptive=False):
+
+    """ Return a list of (instruction, size) tuples of the Bench section
+        of bench_fct, lines being the range of its line numbers.
+
+    """
+    if adaptive:
+        instructions = list(dis.get_instructions(bench_fct, adaptive=True))
+    else:
+        instructions = list(dis.get_instructions(bench_fct))
+    code_size = len(bench_fct.__code__.co_code)
+    offsets = [instruction.offset
+               for instruction in instructions] + [code_size]
+    result = []
+    lineno = None
+    for i, instruction in enumerate(instructions):
+        positions = getattr(instruction, 'positions', None)
+        if positions is not None:
+            lineno = positions.lineno
+        elif instruction.starts_line is not None:
+            lineno = instruction.starts_line
+        if lineno in lines:
+            result.append((instruction, offsets[i + 1] - offsets[i]))
+    return result
+
+def inspect_bytecode(fct, strategy=DEFAULT_STRATEGY, params=None):
+
+    """ Inspect the bytecode of a single copy of the Bench section of
+        the benchmark function fct.
+
+        Returns a dict with the entries instructions (list of (opname,
+        argrepr) tuples), counts (collections.Counter of the opnames),
+        size (code size in bytes) and, on Python 3.11+, specialized
+        (list of (opname, argrepr, unspecialized) tuples of the adaptive
+        instructions after a warmup; unspecialized is true for
+        instructions which failed to specialize, were deoptimized or
+        were not run, e.g. in case arms which don't match).
+
+    """
+    fct_name, code = benchmark_code(
+        fct, iterations=1, fct_name=f'{fct.__name__}_dis',
+        strategy=strategy, params=params)
+    bench_fct = compile_benchmark(fct_name, code)
+    lines = section_line_range(code)
+    instructions = section_instructions(bench_fct, lines)
+    listing = {
+        'instructions': [(instruction.opname, instruction.argrepr)
+                         for instruction, size in instructions],
+        'counts': collections.Counter(instruction.opname
+                                      for instruction, size in instructions),
+        'size': sum(size for instruction, size in instructions),
+        'specialized': None,
+    }
+    if sys.version_info < (3, 11):
+        return listing
+
+    # Warm up, so that the adaptive interpreter can specialize the code
+    bench_fct(DIS_WARMUP_LOOPS)
+    bench_fct(DIS_WARMUP_LOOPS)
+    instructions = [instruction
+                    for instruction, size in section_instructions(
+                        bench_fct, lines, adaptive=True)]
+    flags = unspecialized_flags([instruction.opname
+                                 for instruction in instructions])
+    listing['specialized'] = [
+        (instruction.opname, instruction.argrepr, flag)
+        for instruction, flag in zip(instructions, flags)]
+    return listing
+
+def format_specialized(listing):
+    return [f'{opname:<28s} {argrepr}'.rstrip() +
+            ('   <-- not specialized' if unspecialized else '')
+            for opname, argrepr, unspecialized in listing['specialized']]
+
+def print_bytecode(benchmark_name, listing):
+    instructions = listing['instructions']
+    print (f'{benchmark_name}: Bench section: {len(instructions)} '
+           f'instructions, {listing["size"]} bytes')
+    print ('    ' + ', '.join(f'{opname} {count}'
+                              for opname, count
+                              in listing['counts'].most_common()))
+    for opname, argrepr in instructions:
+        print (f'    {opname:<28s} {argrepr}'.rstrip())
+    if listing['specialized'] is None:
+        print ()
+        return
+    unspecialized = sum(1
+                        for opname, argrepr, flag in listing['specialized']
+                        if flag)
+    print (f'  after warmup ({unspecialized} not specialized):')
+    for line in format_specialized(listing):
+        print (f'    {line}')
+    print ()
+
+def print_bytecode_diffs(listings):
+
+    """ Print a diff of the bytecode of benchmark pairs (see
+        find_pairs()), listings being a list of (benchmark name, group,
+        listing) tuples.
+
+    """
+    for baseline, candidate in pair_items(
+            (name, group, (name, listing))
+            for name, group, listing in listings):
+        (baseline_name, baseline_listing) = baseline
+        (candidate_name, candidate_listing) = candidate
+        if baseline_listing['specialized'] is not None:
+            baseline_lines = format_specialized(baseline_listing)
+            candidate_lines = format_specialized(candidate_listing)
+        else:
+            baseline_lines = [f'{opname:<28s} {argrepr}'.rstrip()
+                              for opname, argrepr
+                              in baseline_listing['instructions']]
+            candidate_lines = [f'{opname:<28s} {argrepr}'.rstrip()
+                               for opname, argrepr
+                               in candidate_listing['instructions']]
+        print (f'{baseline_name} vs. {candidate_name}: '
+               f'{baseline_listing["size"]} vs. '
+               f'{candidate_listing["size"]} bytes')
+        for line in difflib.unified_diff(baseline_lines, candidate_lines,
+                                         baseline_name, candidate_name,
+                                         lineterm=''):
+            print (f'    {line}')
+        print ()
+
+### Profiling
+
+def profile_file(directory, benchmark_name):
+    filename = re.sub(r'[^\w.=-]+', '_', benchmark_name).strip('_')
+    return os.path.join(directory, f'{filename}.pstats')
+
+def profile_benchmark(benchmark_name, bench_fct, iterations, directory,
+                      loops=DEFAULT_PROFILE_LOOPS):
+
+    """ Run bench_fct for the given number of loops under cProfile and
+        write the profile to a .pstats file in directory (which is
+        created, if needed).
+
+        Prints the PROFILE_TOP hotspots (by internal time) and returns
+        the name of the written file.
+
+    """
+    profile = cProfile.Profile()
+    profile.runcall(bench_fct, loops)
+    os.makedirs(directory, exist_ok=True)
+    filename = profile_file(directory, benchmark_name)
+    stats = pstats.Stats(profile)
+    stats.dump_stats(filename)
+
+    # Print hotspots
+    total_time = stats.total_tt or 1.0
+    hotspots = sorted(stats.stats.items(),
+                      key=lambda item: item[1][2],
+                      reverse=True)[:PROFILE_TOP]
+    print (f'{benchmark_name}: Profile of {loops * iterations} operations '
+           f'written to {filename}')
+    print (f'{"ncalls":>12s} {"tottime":>10s} {"cumtime":>10s} '
+           f'{"share":>7s}  function')
+    for (path, lineno, function), (cc, ncalls, tottime, cumtime,
+                                   callers) in hotspots:
+        if path == '~':
+            # Builtin function
+            location = function
+        else:
+            location = f'{os.path.basename(path)}:{lineno}({function})'
+        print (f'{ncalls:12d} {tottime:10.6f} {cumtime:10.6f} '
+               f'{tottime / total_time:7.1%}  {location}')
+    print ()
+    return filename
+
+### Throughput
+
+def gil_enabled():
+
+    """ Return True if the GIL is enabled in the running interpreter.
+
+    """
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    if is_gil_enabled is None:
+        # Python < 3.13 always has the GIL
+        return True
+    return is_gil_enabled()
+
+def measure_threads(bench_fct, threads, loops):
+
+    """ Run bench_fct(loops) in the given number of threads at the same
+        time and return the wall clock time needed for all of them to
+        finish.
+
+    """
+    barrier = threading.Barrier(threads + 1)
+    def worker():
+        barrier.wait()
+        bench_fct(loops)
+    workers = [threading.Thread(target=worker)
+               for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - t0
+
+def run_throughput(runner, benchmark_name, bench_fct, iterations, loops=None,
+                   metadata=None):
+
+    """ Measure the aggregate throughput of bench_fct running in 1..N
+        threads (N given by --mb-threads).
+
+        Each thread runs loops * iterations operations (loops is
+        calibrated to pyperf's --min-time, if not given). The best of
+        THROUGHPUT_REPEAT measurements is used per thread count.
+
+        Prints a table of operations per second and the scaling
+        efficiency (throughput relative to N times the single thread
+        throughput). If --output is given, the time per operation is
+        added as benchmark "<name>[threads=n]" for each thread count.
+
+    """
+    args = runner.args
+    if not loops:
+        loops = 1
+        while bench_fct(loops) < args.min_time:
+            loops *= 2
+    bench_fct(loops)
+
+    print (f'{benchmark_name}: Throughput (GIL '
+           f'{"enabled" if gil_enabled() else "disabled"}, '
+           f'{loops * iterations} operations per thread):')
+    print (f'{"threads":>11s} {"ops/s":>14s} {"efficiency":>12s}')
+    single_throughput = None
+    for threads in range(1, args.mb_threads + 1):
+        operations = threads * loops * iterations
+        durations = [measure_threads(bench_fct, threads, loops)
+                     for i in range(THROUGHPUT_REPEAT)]
+        throughput = operations / min(durations)
+        if single_throughput is None:
+            single_throughput = throughput
+        efficiency = throughput / (threads * single_throughput)
+        print (f'{threads:11d} {throughput:14,.0f} {efficiency:12.1%}')
+        if args.output:
+            run_metadata = dict(metadata or {})
+            run_metadata.update(
+                name=param_benchmark_name(benchmark_name,
+                                          {'threads': threads}),
+                # the values are durations / (loops * inner_loops)
+                loops=loops,
+                inner_loops=iterations * threads,
+                mb_threads=threads,
+                mb_throughput=throughput,
+            )
+            run = pyperf.Run([duration / operations
+                              for duration in durations],
+                             warmups=None, metadata=run_metadata)
+            pyperf.add_runs(args.output, pyperf.Benchmark([run]))
+    print ()
+
+### Adaptive sampling
+
+def relative_ci_width(values):
+
+    """ Return the width of the 95% confidence interval of the mean of
+        values relative to the mean.
+
+    """
+    mean = statistics.mean(values)
+    error = statistics.stdev(values) / math.sqrt(len(values))
+    return 2 * Z_95 * error / mean
+
+def run_adaptive(runner, benchmark_name, bench_fct, iterations, loops=None,
+                 metadata=None):
+
+    """ Run bench_fct in the main process, taking samples until the 95%
+        confidence interval of the mean is narrower than the target
+        width (--mb-target-width), but at least --mb-min-samples and at
+        most --mb-max-samples samples.
+
+        If loops is not given, it is calibrated to reach pyperf's
+        --min-time per sample. Returns a pyperf.Benchmark, which is
+        also printed and added to the --output file, if given.
+
+        The data needed to compare the time used with pyperf's fixed
+        number of processes and values is recorded in
+        runner.mb_adaptive_stats.
+
+    """
+    args = runner.args
+    target_width = (args.mb_target_width or DEFAULT_TARGET_WIDTH * 100) / 100
+    min_samples = max(2, args.mb_min_samples or DEFAULT_MIN_SAMPLES)
+    max_samples = max(min_samples, args.mb_max_samples or DEFAULT_MAX_SAMPLES)
+
+    # Calibrate loops (not timed, since pyperf's estimate below does
+    # not include its calibration either) and warm up
+    if not loops:
+        loops = 1
+        while bench_fct(loops) < args.min_time:
+            loops *= 2
+    t0 = time.perf_counter()
+    warmup_value = bench_fct(loops) / (loops * iterations)
+
+    # Take samples
+    values = []
+    while len(values) < max_samples:
+        values.append(bench_fct(loops) / (loops * iterations))
+        if (len(values) >= min_samples and
+            relative_ci_width(values) <= target_width):
+            break
+    duration = time.perf_counter() - t0
+
+    # Estimate the time pyperf would have used for its fixed sampling
+    # (the worker process startup is added by print_adaptive_summary())
+    warmups = args.warmups if args.warmups is not None else 1
+    fixed_samples = args.processes * (args.values + warmups)
+    fixed_duration = (fixed_samples *
+                      statistics.mean(values) * loops * iterations)
+    runner.mb_adaptive_stats.append(
+        (benchmark_name, len(values), duration, fixed_samples,
+         args.processes, fixed_duration))
+
+    # Build pyperf benchmark
+    run_metadata = dict(metadata or {})
+    run_metadata.update(
+        name=benchmark_name,
+        loops=loops,
+        inner_loops=iterations,
+        mb_adaptive_width=relative_ci_width(values),
+    )
+    run = pyperf.Run(values, warmups=[(loops, warmup_value)],
+                     metadata=run_metadata)
+    bench = pyperf.Benchmark([run])
+    if not args.quiet:
+        print (f'{benchmark_name}: {len(values)} samples, '
+               f'CI width {relative_ci_width(values):.1%}')
+    print (f'{benchmark_name}: Mean +- std dev: '
+           f'{bench.format_value(bench.mean())} +- '
+           f'{bench.format_value(bench.stdev())}')
+    if args.output:
+        pyperf.add_runs(args.output, bench)
+    return bench
+
+def worker_startup_time():
+
+    """ Estimate the startup time of a pyperf worker process, i.e. the
+        time needed to start the interpreter and import pyperf.
+
+    """
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import pyperf'], check=True)
+    return time.perf_counter() - t0
+
+def print_adaptive_summary(stats):
+    if not stats:
+        return
+    samples = sum(stat[1] for stat in stats)
+    duration = sum(stat[2] for stat in stats)
+    fixed_samples = sum(stat[3] for stat in stats)
+    processes = sum(stat[4] for stat in stats)
+    fixed_duration = (sum(stat[5] for stat in stats) +
+                      processes * worker_startup_time())
+    print ()
+    print (f'Adaptive mode: {samples} samples in {duration:.1f} s; '
+           f'fixed sampling would have needed {fixed_samples} samples '
+           f'in {processes} worker processes, '
+           f'about {fixed_duration:.1f} s', end='')
+    if fixed_duration > duration:
+        print (f'; saved {fixed_duration - duration:.1f} s')
+    else:
+        print ()
+
+### Scaling
+
+def fit_loglog(points):
+
+    """ Fit time = c * size ** k to the list of (size, time) points
+        using least squares on the log-log values.
+
+        Returns k or None, if there are not enough usable points.
+
+    """
+    points = [(math.log(size), math.log(time))
+              for size, time in points
+              if size > 0 and time > 0]
+    if len(set(x for x, y in points)) < 2:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, y in points) / n
+    mean_y = sum(y for x, y in points) / n
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    sxx = sum((x - mean_x) ** 2 for x, y in points)
+    return sxy / sxx
+
+def fit_exponent(points):
+
+    """ Estimate k for time = a + b * size ** k from the list of
+        (size, time) points.
+
+        The constant a (loop and setup overhead) would flatten a plain
+        log-log fit, so the time of the smallest size is subtracted
+        first and only the largest half (at least two) of the
+        remaining sizes is fitted, where b * size ** k dominates. If
+        the time grows by less than SCALING_CONSTANT_TOLERANCE, 0 is
+        returned. With too few sizes, this falls back to the plain
+        log-log fit of all points.
+
+        Returns k or None, if there are not enough usable points.
+
+    """
+    points = sorted((size, time)
+                    for size, time in points
+                    if size > 0 and time > 0)
+    if len(set(size for size, time in points)) < 2:
+        return None
+    min_size, min_time = points[0]
+    if max(time for size, time in points) < (
+            min_time * (1 + SCALING_CONSTANT_TOLERANCE)):
+        return 0.0
+    larger = [(size, time - min_time)
+              for size, time in points
+              if size > min_size and time > min_time]
+    larger = larger[min(len(larger) // 2, len(larger) - 2):]
+    if len(set(size for size, time in larger)) < 2:
+        return fit_loglog(points)
+    return fit_loglog(larger)
+
+def complexity_string(name, exponent):
+    for k, label in ((0, 'O(1)'), (1, f'O({name})'), (2, f'O({name}^2)')):
+        if abs(exponent - k) < 0.25:
+            return f'{name}^{exponent:.2f} ~ {label}'
+    return f'{name}^{exponent:.2f}'
+
+def print_scaling_summary(results):
+
+    """ Print a table of time vs. parameters for each parametrized
+        benchmark family in results and the fitted complexity per
+        numeric parameter.
+
+        results is a list of BenchmarkResult tuples.
+
+    """
+    families = {}
+    for result in results:
+        if result.params:
+            families.setdefault(result.family, []).append(
+                (result.params, result.bench))
+    for family_name, points in families.items():
+        names = list(points[0][0])
+        print ()
+        print (f'{family_name}:')
+        print ('    ' + ''.join(f'{name:>12s}' for name in names) +
+               f'{"mean":>14s}')
+        for params, bench in points:
+            print ('    ' +
+                   ''.join(f'{params[name]!r:>12s}' for name in names) +
+                   f'{bench.format_value(bench.mean()):>14s}')
+        for name in names:
+            # Fit per combination of the other parameters and average
+            groups = {}
+            for params, bench in points:
+                value = params[name]
+                if not isinstance(value, (int, float)):
+                    break
+                others = tuple((other, repr(params[other]))
+                               for other in names if other != name)
+                groups.setdefault(others, []).append((value, bench.mean()))
+            else:
+                exponents = [fit_exponent(group)
+                             for group in groups.values()]
+                exponents = [k for k in exponents if k is not None]
+                if exponents:
+                    exponent = sum(exponents) / len(exponents)
+                    print (f'    complexity: time ~ '
+                           f'{complexity_string(name, exponent)}')
+
+### Comparison
+
+def find_pairs(results):
+
+    """ Find pairs of benchmarks to compare in results (a list of
+        BenchmarkResult tuples).
+
+        Benchmarks configured with the same group are compared to the
+        first benchmark of the group. Other benchmarks are paired by
+        naming convention: bench_match_* is compared to bench_if_*.
+
+        Returns a list of (baseline, candidate) pyperf.Benchmark
+        tuples.
+
+    """
+    return pair_items(
+        (result.bench.get_name(), result.group, result.bench)
+        for result in results)
+
+def pair_items(items):
+
+    """ Find pairs of items to compare, using the same rules as
+        find_pairs().
+
+        items must be an iterable of (name, group, value) tuples.
+        Returns a list of (baseline value, candidate value) tuples.
+
+    """
+    pairs = []
+    groups = {}
+    by_name = {}
+    for name, group, value in items:
+        if group is not None:
+            groups.setdefault(group, []).append(value)
+        else:
+            by_name[name] = value
+    for values in groups.values():
+        for value in values[1:]:
+            pairs.append((values[0], value))
+    for name, value in by_name.items():
+        if '_match_' not in name:
+            continue
+        baseline = by_name.get(name.replace('_match_', '_if_', 1))
+        if baseline is not None:
+            pairs.append((baseline, value))
+    return pairs
+
+def t_95(df):
+
+    """ Return the two-sided 95% quantile of the Student t distribution
+        with df degrees of freedom.
+
+        Beyond the T_95 table, the Cornish-Fisher expansion around Z_95
+        is used, which is accurate to 3 digits there.
+
+    """
+    if df < len(T_95):
+        return T_95[max(df, 1)]
+    z = Z_95
+    return (z + (z ** 3 + z) / (4 * df) +
+            (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2))
+
+def speedup_interval(baseline_values, candidate_values):
+
+    """ Return a tuple (baseline mean, candidate mean, speedup, ci_low,
+        ci_high) for the timing values of a baseline and a candidate.
+
+        The speedup is baseline mean / candidate mean. ci_low and
+        ci_high are the bounds of its 95% confidence interval, computed
+        using the delta method on the means of the values. Since the
+        number of values is often small, the t quantile for the
+        smaller sample (see t_95()) is used instead of Z_95.
+
+    """
+    def mean_and_error(values):
+        mean = statistics.mean(values)
+        if len(values) < 2:
+            return mean, 0.0
+        return mean, statistics.stdev(values) / math.sqrt(len(values))
+
+    baseline_mean, baseline_error = mean_and_error(baseline_values)
+    candidate_mean, candidate_error = mean_and_error(candidate_values)
+    speedup = baseline_mean / candidate_mean
+    relative_error = math.sqrt((baseline_error / baseline_mean) ** 2 +
+                               (candidate_error / candidate_mean) ** 2)
+    t = t_95(min(len(baseline_values), len(candidate_values)) - 1)
+    ci_low = speedup * (1 - t * relative_error)
+    ci_high = speedup * (1 + t * relative_error)
+    return baseline_mean, candidate_mean, speedup, ci_low, ci_high
+
+def compare_benchmarks(baseline, candidate):
+
+    """ Compare the candidate pyperf.Benchmark to the baseline.
+
+        Returns a dict with the speedup (baseline time / candidate
+        time), its 95% confidence interval and whether the difference
+        is statistically significant (the interval does not include
+        1.0), see speedup_interval().
+
+    """
+    (baseline_mean, candidate_mean,
+     speedup, ci_low, ci_high) = speedup_interval(baseline.get_values(),
+                                                  candidate.get_values())
+    return {
+        'baseline': baseline.get_name(),
+        'candidate': candidate.get_name(),
+        'baseline_mean': baseline_mean,
+        'candidate_mean': candidate_mean,
+        'speedup': speedup,
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+        'significant': not (ci_low <= 1.0 <= ci_high),
+    }
+
+def compare_results(results):
+
+    """ Compare all benchmark pairs found in results (see find_pairs())
+        and return a list of comparison dicts (see
+        compare_benchmarks()), sorted by descending speedup.
+
+    """
+    comparisons = [compare_benchmarks(baseline, candidate)
+                   for baseline, candidate in find_pairs(results)]
+    comparisons.sort(key=lambda x: x['speedup'], reverse=True)
+    return comparisons
+
+def print_comparison(comparisons):
+    if not comparisons:
+        return
+    width = max(len(comparison['candidate'])
+                for comparison in comparisons)
+    baseline_width = max(len(comparison['baseline'])
+                         for comparison in comparisons)
+    print ()
+    print ('Comparison (speedup = baseline time / candidate time):')
+    print (f'{"candidate":<{width}s}  {"baseline":<{baseline_width}s}  '
+           f'{"speedup":>8s}  {"95% CI":>15s}')
+    for comparison in comparisons:
+        if comparison['significant']:
+            note = ''
+        else:
+            note = '  (not significant)'
+        print (f'{comparison["candidate"]:<{width}s}  '
+               f'{comparison["baseline"]:<{baseline_width}s}  '
+               f'{comparison["speedup"]:7.2f}x  '
+               f'[{comparison["ci_low"]:5.2f}, {comparison["ci_high"]:5.2f}]'
+               f'{note}')
+
+### Baselines
+
+def baseline_file(name, baseline_dir=DEFAULT_BASELINE_DIR):
+
+    """ Return the file name for the baseline name.
+
+        name may also be the path of a pyperf JSON file, e.g. as
+        written using the -o option.
+
+    """
+    if name.endswith('.json'):
+        return name
+    return os.path.join(baseline_dir, f'{name}.json')
+
+def save_baseline(results, name, baseline_dir=DEFAULT_BASELINE_DIR):
+
+    """ Save the benchmarks in results (a list of BenchmarkResult
+        tuples) as pyperf JSON file under the baseline name.
+
+        Returns the file name.
+
+    """
+    filename = baseline_file(name, baseline_dir)
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    suite = pyperf.BenchmarkSuite([result.bench for result in results])
+    suite.dump(filename, replace=True)
+    return filename
+
+def check_baseline(results, name, baseline_dir=DEFAULT_BASELINE_DIR,
+                   max_slowdown=DEFAULT_MAX_SLOWDOWN):
+
+    """ Compare the benchmarks in results against the baseline name.
+
+        A benchmark counts as regression, if it is significantly slower
+        (see compare_benchmarks()) and the slowdown exceeds
+        max_slowdown (a fraction, e.g. 0.05 for 5%).
+
+        Returns a list of comparison dicts with an additional entry
+        regression.
+
+    """
+    suite = pyperf.BenchmarkSuite.load(baseline_file(name, baseline_dir))
+    baseline_benches = {bench.get_name(): bench
+                        for bench in suite.get_benchmarks()}
+    comparisons = []
+    for result in results:
+        baseline = baseline_benches.get(result.bench.get_name())
+        if baseline is None:
+            continue
+        comparison = compare_benchmarks(baseline, result.bench)
+        slowdown = (comparison['candidate_mean'] /
+                    comparison['baseline_mean'] - 1)
+        comparison['slowdown'] = slowdown
+        comparison['regression'] = (comparison['significant'] and
+                                    slowdown > max_slowdown)
+        comparisons.append(comparison)
+    return comparisons
+
+def print_baseline_check(comparisons, name, max_slowdown):
+    print ()
+    print (f'Check against baseline {name} '
+           f'(max. slowdown {max_slowdown:.1%}):')
+    if not comparisons:
+        print ('no matching benchmarks found')
+        return
+    width = max(len(comparison['candidate'])
+                for comparison in comparisons)
+    for comparison in comparisons:
+        if comparison['regression']:
+            status = 'REGRESSION'
+        elif not comparison['significant']:
+            status = 'not significant'
+        else:
+            status = 'ok'
+        # Convert the speedup interval to a slowdown interval
+        slowdown_low = 1 / comparison['ci_high'] - 1
+        if comparison['ci_low'] > 0:
+            slowdown_high = f'{1 / comparison["ci_low"] - 1:+.1%}'
+        else:
+            slowdown_high = 'inf'
+        print (f'{comparison["candidate"]:<{width}s}  '
+               f'{comparison["slowdown"]:+8.1%}  '
+               f'[{slowdown_low:+.1%}, {slowdown_high}]  {status}')
+
+### History
+
+def source_hash(fct):
+    (lines, start_lineno) = inspect.getsourcelines(fct)
+    return hashlib.sha256(''.join(lines).encode('utf-8')).hexdigest()[:16]
+
+def git_commit(path):
+
+    """ Return the git commit hash of the working tree at path or None,
+        if not available.
+
+    """
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=path or '.',
+            capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.strip() or None
+
+def open_history(filename):
+    db = sqlite3.connect(filename)
+    db.execute(HISTORY_SCHEMA)
+    return db
+
+def append_history(results, filename):
+
+    """ Append the benchmarks in results (a list of BenchmarkResult
+        tuples) to the SQLite history database filename.
+
+        Together with the values, the interpreter, CPU, iterations,
+        source hash of the benchmark function and git commit of its
+        source directory are stored.
+
+    """
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+    commits = {}
+    rows = []
+    for result in results:
+        bench = result.bench
+        metadata = bench.get_metadata()
+        values = bench.get_values()
+        directory = os.path.dirname(inspect.getsourcefile(result.fct))
+        if directory not in commits:
+            commits[directory] = git_commit(directory)
+        rows.append((
+            timestamp,
+            bench.get_name(),
+            result.family,
+            json.dumps(result.params) if result.params else None,
+            bench.mean(),
+            bench.stdev() if len(values) > 1 else 0.0,
+            len(values),
+            metadata.get('python_version'),
+            metadata.get('python_implementation'),
+            metadata.get('cpu_model_name'),
+            metadata.get('hostname'),
+            bench.get_inner_loops(),
+            source_hash(result.fct),
+            commits[directory],
+        ))
+    with open_history(filename) as db:
+        db.executemany(
+            'insert into results (timestamp, name, family, params, '
+            'mean, stdev, nvalues, python, implementation, cpu, '
+            'hostname, iterations, source_hash, git_commit) '
+            'values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            rows)
+    db.close()
+
+def find_change_points(rows, threshold=DEFAULT_CHANGE_THRESHOLD):
+
+    """ Flag change points in rows, a list of (mean, stdev, nvalues)
+        tuples in time order.
+
+        A row is a change point if its mean differs from the previous
+        one by more than threshold (relative) and the difference is
+        significant at the 95% level.
+
+        Returns a list with one entry per row: 0 for no change, +1 for
+        a slowdown, -1 for a speedup.
+
+    """
+    flags = [0]
+    for (mean0, stdev0, n0), (mean1, stdev1, n1) in zip(rows, rows[1:]):
+        error = math.sqrt(stdev0 ** 2 / max(n0, 1) + stdev1 ** 2 / max(n1, 1))
+        difference = mean1 - mean0
+        if (abs(difference) > threshold * mean0 and
+            abs(difference) > Z_95 * error):
+            flags.append(1 if difference > 0 else -1)
+        else:
+            flags.append(0)
+    return flags
+
+def print_history(filename, filters=None, threshold=DEFAULT_CHANGE_THRESHOLD):
+
+    """ Print the trend of all benchmarks stored in the history
+        database filename, optionally limited to the benchmark names
+        matching one of the regular expressions in filters.
+
+        Series are kept separate per benchmark, Python version and
+        host. Change points (see find_change_points()) are flagged.
+
+    """
+    if filters:
+        re_filter = re.compile('|'.join(filters)).search
+    else:
+        re_filter = lambda x: True
+    db = open_history(filename)
+    rows = db.execute(
+        'select name, python, hostname, timestamp, git_commit, '
+        'source_hash, mean, stdev, nvalues from results '
+        'order by name, python, hostname, id').fetchall()
+    db.close()
+    series = {}
+    for name, python, hostname, *row in rows:
+        if re_filter(name) is None:
+            continue
+        series.setdefault((name, python, hostname), []).append(row)
+    for (name, python, hostname), rows in series.items():
+        print ()
+        print (f'{name} (Python {python} on {hostname}):')
+        flags = find_change_points(
+            [(mean, stdev, nvalues)
+             for (timestamp, commit, source, mean, stdev, nvalues) in rows],
+            threshold)
+        previous = None
+        for (timestamp, commit, source, mean, stdev, nvalues), flag in zip(
+                rows, flags):
+            if previous is None:
+                change = ''
+            else:
+                change = f'{mean / previous - 1:+7.1%}'
+            note = {1: '  <- slower', -1: '  <- faster', 0: ''}[flag]
+            print (f'    {timestamp}  {(commit or "-")[:10]:10s}  '
+                   f'{source}  {mean * 1e9:10.1f} ns '
+                   f'+- {stdev * 1e9:6.1f} ns  {change:>7s}{note}')
+            previous = mean
+
+def history_main(argv=None):
+    argparser = argparse.ArgumentParser(
+        prog='micro_benchmark.py history',
+        description='Show benchmark trends stored in a history database')
+    argparser.add_argument(
+        'database',
+        help='SQLite history database written using --mb-history')
+    argparser.add_argument(
+        '--filter',
+        help='only show benchmarks matching these regular expressions',
+        nargs='*')
+    argparser.add_argument(
+        '--threshold',
+        help='relative change flagged as change point in percent '
+             f'(default: {DEFAULT_CHANGE_THRESHOLD * 100:g}%%)',
+        type=float)
+    args = argparser.parse_args(argv)
+    if not os.path.isfile(args.database):
+        # sqlite3 would silently create an empty database
+        argparser.error(f'history database not found: {args.database}')
+    if args.threshold is None:
+        threshold = DEFAULT_CHANGE_THRESHOLD
+    else:
+        threshold = args.threshold / 100
+    print_history(args.database, args.filter, threshold)
 
 def worker_add_cmdline_args(cmd, args):
 
     # Make sure our custom args are added to workers as well
+    if args.mb_suite:
+        cmd.extend(('--mb-suite', args.mb_suite))
     if args.mb_filter:
         cmd.extend(('--mb-filter', *args.mb_filter))
+    if args.mb_strategy:
+        cmd.extend(('--mb-strategy', args.mb_strategy))
+    if args.mb_calibrate:
+        cmd.append('--mb-calibrate')
+    if _calibrations:
+        cmd.extend(('--mb-calibration', json.dumps(_calibrations)))
+    if args.mb_memory:
+        cmd.append('--mb-memory')
+    if _memory_stats:
+        cmd.extend(('--mb-memory-stats', json.dumps(_memory_stats)))
+    if args.mb_no_overhead:
+        cmd.append('--mb-no-overhead')
+    if args.mb_gc:
+        cmd.extend(('--mb-gc', args.mb_gc))
+    if _cpu_times:
+        cmd.extend(('--mb-cpu-times', json.dumps(_cpu_times)))
+    if args.mb_mix:
+        cmd.extend(('--mb-mix', args.mb_mix))
+    if _overheads:
+        cmd.extend(('--mb-overheads', json.dumps(_overheads)))
+    if args.mb_no_cache:
+        cmd.append('--mb-no-cache')
+    if args.mb_cache_dir:
+        cmd.extend(('--mb-cache-dir', args.mb_cache_dir))
     if _debug:
         print (f'worker cmd: {cmd}')
 
@@ -187,13 +1924,200 @@ def create_runner():
         help='filter micro benchmark function (regexp)',
         nargs='*',
         type=str)
+    runner.argparser.add_argument(
+        '--mb-suite',
+        help='run the benchmarks of all bench_*.py modules found in the '
+             'given directory (default: current directory); --mb-filter '
+             'expressions are matched against "function" and '
+             '"module.function"',
+        metavar='DIR',
+        nargs='?',
+        const='.',
+        type=str)
+    runner.argparser.add_argument(
+        '--mb-strategy',
+        help='strategy for repeating the bench code (default: '
+             f'{DEFAULT_STRATEGY})',
+        choices=STRATEGIES)
+    runner.argparser.add_argument(
+        '--mb-calibrate',
+        help='auto calibrate the iterations and loops of all benchmarks',
+        action='store_true')
+    runner.argparser.add_argument(
+        '--mb-target-time',
+        help='target time per sample in seconds used by the auto '
+             'calibration (default: --min-time)',
+        type=float)
+    runner.argparser.add_argument(
+        '--mb-calibration',
+        help=argparse.SUPPRESS)
+    runner.argparser.add_argument(
+        '--mb-memory',
+        help='measure memory allocations of all benchmarks using '
+             'tracemalloc',
+        action='store_true')
+    runner.argparser.add_argument(
+        '--mb-memory-stats',
+        help=argparse.SUPPRESS)
+    runner.argparser.add_argument(
+        '--mb-no-overhead',
+        help='do not measure the loop overhead and report the net time '
+             'of the benchmarks',
+        action='store_true')
+    runner.argparser.add_argument(
+        '--mb-overheads',
+        help=argparse.SUPPRESS)
+    runner.argparser.add_argument(
+        '--mb-gc',
+        help='garbage collector mode for all benchmarks not configuring '
+             f'their own (default: {DEFAULT_GC_MODE})',
+        choices=GC_MODES)
+    runner.argparser.add_argument(
+        '--mb-cpu-times',
+        help=argparse.SUPPRESS)
+    runner.argparser.add_argument(
+        '--mb-mix',
+        help='comma separated weights of the corpus inputs for all '
+             'benchmarks using input rotation (overrides the configured '
+             'mix)',
+        type=str)
+    runner.argparser.add_argument(
+        '--mb-profile',
+        help='profile the benchmarks with cProfile (outside of the timed '
+             'runs), write one .pstats file per benchmark to the given '
+             'directory and print the top hotspots',
+        metavar='DIR',
+        type=str)
+    runner.argparser.add_argument(
+        '--mb-profile-loops',
+        help='number of loops to run under the profiler (default: '
+             f'{DEFAULT_PROFILE_LOOPS})',
+        type=int)
+    runner.argparser.add_argument(
+        '--mb-threads',
+        help='measure the aggregate throughput of running the benchmarks '
+             'in 1..N threads at the same time, instead of the latency',
+        metavar='N',
+        type=int)
+    runner.argparser.add_argument(
+        '--mb-dis',
+        help='show the bytecode of the Bench sections (and the '
+             'specialized bytecode after a warmup on Python 3.11+) '
+             'instead of running the benchmarks',
+        action='store_true')
+    runner.argparser.add_argument(
+        '--mb-compare',
+        help='compare benchmark pairs (bench_match_* vs. bench_if_* '
+             'or configured groups) and print a speedup table',
+        action='store_true')
+    runner.argparser.add_argument(
+        '--mb-compare-json',
+        help='write the comparison as JSON to the given file '
+             '(implies --mb-compare)',
+        type=str)
+    runner.argparser.add_argument(
+        '--mb-save-baseline',
+        help='save the results as baseline with the given name',
+        metavar='NAME',
+        type=str)
+    runner.argparser.add_argument(
+        '--mb-check-baseline',
+        help='compare the results against the baseline with the given '
+             'name (or pyperf JSON file) and exit with an error in case '
+             'of regressions',
+        metavar='NAME',
+        type=str)
+    runner.argparser.add_argument(
+        '--mb-baseline-dir',
+        help=f'directory for baselines (default: {DEFAULT_BASELINE_DIR})',
+        default=DEFAULT_BASELINE_DIR,
+        type=str)
+    runner.argparser.add_argument(
+        '--mb-max-slowdown',
+        help='maximum accepted slowdown in percent when checking against '
+             f'a baseline (default: {DEFAULT_MAX_SLOWDOWN * 100:g}%%)',
+        type=float)
+    runner.argparser.add_argument(
+        '--mb-history',
+        help='append the results to the given SQLite history database',
+        metavar='DATABASE',
+        type=str)
+    runner.argparser.add_argument(
+        '--mb-adaptive',
+        help='sample in the main process until the confidence interval '
+             'is narrow enough, instead of using a fixed number of '
+             'worker processes and values',
+        action='store_true')
+    runner.argparser.add_argument(
+        '--mb-target-width',
+        help='target width of the 95%% confidence interval in percent '
+             f'of the mean (default: {DEFAULT_TARGET_WIDTH * 100:g})',
+        type=float)
+    runner.argparser.add_argument(
+        '--mb-min-samples',
+        help='minimum number of samples in adaptive mode (default: '
+             f'{DEFAULT_MIN_SAMPLES})',
+        type=int)
+    runner.argparser.add_argument(
+        '--mb-max-samples',
+        help='maximum number of samples in adaptive mode (default: '
+             f'{DEFAULT_MAX_SAMPLES})',
+        type=int)
+    runner.argparser.add_argument(
+        '--mb-no-cache',
+        help='do not cache the compiled benchmark code on disk',
+        action='store_true')
+    runner.argparser.add_argument(
+        '--mb-cache-dir',
+        help='directory for the compiled benchmark code cache '
+             '(default: __pycache__ next to the benchmark module)',
+        type=str)
 
     # Parse command line
     runner.parse_args()
 
+    # Check the baseline before running any benchmarks
+    args = runner.args
+    if args.mb_check_baseline and not args.worker:
+        filename = baseline_file(args.mb_check_baseline,
+                                 args.mb_baseline_dir)
+        if not os.path.isfile(filename):
+            runner.argparser.error(f'baseline not found: {filename}')
+
+    # Results of the run benchmarks: list of BenchmarkResult tuples
+    runner.mb_results = []
+
+    # Statistics of the adaptive mode: list of (benchmark name, samples,
+    # duration, fixed samples, fixed processes, estimated fixed duration
+    # without worker startup) tuples
+    runner.mb_adaptive_stats = []
+
+    # Bytecode listings in --mb-dis mode: list of (benchmark name, group,
+    # listing) tuples
+    runner.mb_listings = []
+    if runner.args.mb_calibration:
+        # Calibrations passed in from the main process
+        _calibrations.update(json.loads(runner.args.mb_calibration))
+    if runner.args.mb_memory_stats:
+        # Memory statistics passed in from the main process
+        _memory_stats.update(json.loads(runner.args.mb_memory_stats))
+    if runner.args.mb_overheads:
+        # Loop overheads passed in from the main process
+        _overheads.update(json.loads(runner.args.mb_overheads))
+    if runner.args.mb_cpu_times:
+        # CPU times passed in from the main process
+        _cpu_times.update(json.loads(runner.args.mb_cpu_times))
+    global _use_code_cache, _code_cache_dir, _mix
+    if runner.args.mb_mix:
+        _mix = [float(weight) for weight in runner.args.mb_mix.split(',')]
+    if runner.args.mb_no_cache:
+        _use_code_cache = False
+    if runner.args.mb_cache_dir:
+        _code_cache_dir = runner.args.mb_cache_dir
+
     return runner
 
-def run(namespace, prefix='bench_', filters=None):
+def run(namespace, prefix='bench_', filters=None, history=None):
 
     """ Run all benchmark functions found in namespace.
 
@@ -206,6 +2130,11 @@ def run(namespace, prefix='bench_', filters=None):
         --mb-filter is used. If this is missing as well, no filtering
         takes place.
 
+        history may be given as file name of an SQLite database to
+        which all results are appended. If not given, the command line
+        argument --mb-history is used. Use "micro_benchmark.py history
+        DATABASE" to show the trends stored in the database.
+
     """
     # Create runner (early, since this provides the CLI interface)
     runner = create_runner()
@@ -222,11 +2151,22 @@ def run(namespace, prefix='bench_', filters=None):
     else:
         re_filter = lambda x: True
 
+    # Use the benchmark modules of a suite directory, if requested
+    suite = runner.args.mb_suite
+    if suite:
+        namespace = discover_benchmarks(suite, prefix)
+
     # Find all bench_* functions
     benchmarks = []
     for key, value in namespace.items():
         if key.startswith(prefix) and callable(value):
-            if re_filter(key) is None:
+            # In suite mode, match the function name as well as the
+            # qualified name, so that existing filters keep working
+            if suite:
+                filter_key = f'{value.__module__}.{key}'
+            else:
+                filter_key = key
+            if re_filter(key) is None and re_filter(filter_key) is None:
                 if _debug:
                     print (f'filtering out {key}')
                 continue
@@ -235,20 +2175,148 @@ def run(namespace, prefix='bench_', filters=None):
     # Use runner to run all found benchmark functions
     for bench_fct in benchmarks:
         run_benchmark(runner, bench_fct)
+
+    if history is None:
+        history = runner.args.mb_history
+    if not runner.args.worker:
+        process_results(runner, history)
     return runner
 
+def discover_benchmarks(directory, prefix='bench_'):
+
+    """ Import all modules named <prefix>*.py in directory and return a
+        namespace dict with all benchmark functions defined in them (in
+        file name and definition order).
+
+        Benchmark names have to be unique across the modules; use
+        configure(name=...) to rename benchmarks, if needed.
+
+    """
+    directory = os.path.abspath(directory)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    namespace = {}
+    names = {}
+    for filename in sorted(glob.glob(os.path.join(directory,
+                                                  f'{prefix}*.py'))):
+        module_name = os.path.splitext(os.path.basename(filename))[0]
+        module = importlib.import_module(module_name)
+        for key, value in vars(module).items():
+            if (not key.startswith(prefix) or
+                not callable(value) or
+                getattr(value, '__module__', None) != module_name):
+                continue
+            name = getattr(value, 'name', key)
+            for used in (name, key):
+                if used in names:
+                    raise ValueError(
+                        f'duplicate benchmark name {used!r} in modules '
+                        f'{names[used]} and {module_name}')
+            names[name] = names[key] = module_name
+            namespace[key] = value
+    return namespace
+
+def process_results(runner, history=None):
+
+    """ Print the summaries and run the result processing requested on
+        the command line for the results collected in runner.
+
+    """
+    args = runner.args
+    results = runner.mb_results
+    print_adaptive_summary(runner.mb_adaptive_stats)
+    if runner.mb_listings:
+        print_bytecode_diffs(runner.mb_listings)
+    print_scaling_summary(results)
+    if args.mb_compare or args.mb_compare_json:
+        comparisons = compare_results(results)
+        print_comparison(comparisons)
+        if args.mb_compare_json:
+            with open(args.mb_compare_json, 'w') as file:
+                json.dump(comparisons, file, indent=2)
+    if args.mb_save_baseline and results:
+        filename = save_baseline(results, args.mb_save_baseline,
+                                 args.mb_baseline_dir)
+        print (f'Saved baseline {args.mb_save_baseline} to {filename}')
+    if history and results:
+        append_history(results, history)
+        print (f'Appended results to history {history}')
+    if args.mb_check_baseline:
+        if args.mb_max_slowdown is None:
+            max_slowdown = DEFAULT_MAX_SLOWDOWN
+        else:
+            max_slowdown = args.mb_max_slowdown / 100
+        comparisons = check_baseline(results, args.mb_check_baseline,
+                                     args.mb_baseline_dir, max_slowdown)
+        print_baseline_check(comparisons, args.mb_check_baseline,
+                             max_slowdown)
+        if any(comparison['regression']
+               for comparison in comparisons):
+            sys.exit(1)
+
 ### Decorators
 
-def configure(iterations=None, name=None):
+def configure(iterations=None, name=None, strategy=None, memory=None,
+              params=None, group=None, rotate=None, mix=None, gc=None):
+
+    """ Configure a benchmark function.
+
+        iterations sets the number of times the Bench section is run
+        per loop. Use 'auto' to have it calibrated automatically. name
+        overrides the benchmark name. strategy sets how the Bench
+        section is repeated, see STRATEGIES. memory enables the memory
+        measurement, see measure_memory().
+
+        params may be given as dict mapping variable names to lists of
+        values. One benchmark is run per combination of values, with
+        the variables defined in the Init section. A summary of time
+        vs. parameters is printed at the end of the run.
+
+        group puts the benchmark into a comparison group. With
+        --mb-compare, all benchmarks of a group are compared to the
+        first one run. Benchmarks without group are paired by naming
+        convention (bench_match_* vs. bench_if_*).
+
+        rotate enables input rotation: it names the variable the Bench
+        section works on. The Init section has to define a list corpus
+        of inputs, which are assigned to the variable in turn before
+        each run of the Bench section, so that the interpreter sees a
+        polymorphic workload. mix may be given as list of weights for
+        the corpus entries (default: equal weights) and can be
+        overridden with --mb-mix.
+
+        gc sets the garbage collector mode to use when running the
+        benchmark, see GC_MODES. It overrides --mb-gc.
+
+    """
     def wrapper(fct):
         if iterations is not None:
             fct.iterations = iterations
         if name is not None:
             fct.name = name
+        if strategy is not None:
+            fct.strategy = strategy
+        if memory is not None:
+            fct.memory = memory
+        if params is not None:
+            fct.params = params
+        if group is not None:
+            fct.group = group
+        if rotate is not None:
+            fct.rotate = rotate
+        if mix is not None:
+            fct.mix = mix
+        if gc is not None:
+            fct.gc = gc
         return fct
     return wrapper
 
 ###
 
 if __name__ == '__main__':
-    runner = run(globals())
+    # Make sure benchmark modules imported by --mb-suite use this module
+    sys.modules.setdefault('micro_benchmark', sys.modules['__main__'])
+    if sys.argv[1:2] == ['history']:
+        history_main(sys.argv[2:])
+    else:
+        runner = run(globals())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+""" Seeded synthetic data generator for the parser benchmarks
+
+    Generates country XML documents (as used by match_xml), demo JSON
+    records in NDJSON format (as used by match_json) and GeoJSON
+    FeatureCollections (as used by match_geojson) of a given size, with
+    a configurable share of invalid records.
+
+    Use: synthetic_data.py {xml,json,geojson} SIZE FILENAME
+                           [--invalid SHARE] [--seed SEED]
+
+    SIZE may be given with a KB, MB or GB suffix, e.g. 10MB.
+
+"""
+import argparse
+import json
+import random
+import re
+import sys
+
+### Globals
+
+# Data kinds and the file extension to use for them
+KINDS = {
+    'xml': 'xml',
+    'json': 'ndjson',
+    'geojson': 'geojson',
+}
+
+# Size suffixes
+SIZE_UNITS = {
+    '': 1,
+    'B': 1,
+    'K': 1024,
+    'KB': 1024,
+    'M': 1024 ** 2,
+    'MB': 1024 ** 2,
+    'G': 1024 ** 3,
+    'GB': 1024 ** 3,
+}
+
+# Default random seed
+DEFAULT_SEED = 0
+
+# Names and directions used for the generated data
+NAMES = (
+    'eggs', 'spam', 'ham', 'bacon', 'beans', 'toast', 'tomato', 'sausage',
+)
+DIRECTIONS = ('N', 'E', 'S', 'W')
+
+### Helpers
+
+def parse_size(size):
+
+    """ Convert size to a number of bytes.
+
+        size may be given as integer or as string with an optional
+        B, KB, MB or GB suffix (1KB = 1024 bytes). The B may be
+        omitted, e.g. 10M.
+
+    """
+    if isinstance(size, int):
+        return size
+    parts = re.fullmatch(r'\s*([\d.]+)\s*([KMG]?B?)\s*', size.upper())
+    if parts is None:
+        raise ValueError(f'invalid size: {size!r}')
+    value, unit = parts.groups()
+    return int(float(value) * SIZE_UNITS[unit])
+
+def format_size(size):
+    for unit in ('GB', 'MB', 'KB'):
+        if size >= SIZE_UNITS[unit]:
+            return f'{size / SIZE_UNITS[unit]:g}{unit}'
+    return f'{size}B'
+
+def write_records(file, size, records, header=b'', separator=b'',
+                  footer=b''):
+
+    """ Write the records (an iterator of bytes) to file, until at
+        least size bytes have been written (or records is exhausted).
+
+        header and footer are written before and after the records,
+        separator between them. Returns the number of bytes written.
+
+    """
+    written = file.write(header)
+    for i, record in enumerate(records):
+        if i:
+            written += file.write(separator)
+        written += file.write(record)
+        if written + len(footer) >= size:
+            break
+    written += file.write(footer)
+    return written
+
+### Country XML
+
+def country_record(rng, index, invalid=False):
+    name = f'Country {index}'
+    rank = str(rng.randint(1, 200))
+    neighbors = ''.join(
+        f'        <neighbor name="Country {rng.randint(0, index + 10)}" '
+        f'direction="{rng.choice(DIRECTIONS)}"/>\n'
+        for i in range(rng.randint(0, 3)))
+    name_attribute = f' name="{name}"'
+    extra = ''
+    if invalid:
+        match rng.randint(0, 2):
+            case 0:
+                # Missing name attribute
+                name_attribute = ''
+            case 1:
+                # Unknown child element
+                extra = '        <population>42</population>\n'
+            case 2:
+                # Non-numeric rank
+                rank = 'first'
+    return (
+        f'    <country{name_attribute}>\n'
+        f'        <rank>{rank}</rank>\n'
+        f'        <year>{rng.randint(2000, 2024)}</year>\n'
+        f'        <gdppc>{rng.randint(1000, 150000)}</gdppc>\n'
+        f'{neighbors}{extra}'
+        f'    </country>\n').encode('utf-8')
+
+def generate_countries_xml(file, size, invalid=0.0, seed=DEFAULT_SEED):
+
+    """ Write a country XML document of about size bytes to the binary
+        file file.
+
+        invalid gives the share of invalid country records (0.0 - 1.0).
+        Returns the number of bytes written.
+
+    """
+    rng = random.Random(seed)
+    records = (country_record(rng, index, rng.random() < invalid)
+               for index in range(sys.maxsize))
+    return write_records(file, size, records,
+                         header=b'<?xml version="1.0"?>\n<data>\n',
+                         footer=b'</data>\n')
+
+### Demo JSON
+
+def demo_record(rng, invalid=False):
+    record = {
+        'name': rng.choice(NAMES),
+        'price': round(rng.uniform(0.5, 20.0), 2),
+    }
+    if rng.random() < 0.2:
+        record['color'] = rng.choice(('brown', 'white'))
+    if invalid:
+        match rng.randint(0, 3):
+            case 0:
+                # Missing price
+                del record['price']
+            case 1:
+                # Wrong price type
+                record['price'] = str(record['price'])
+            case 2:
+                # Not an object
+                record = [1, 2, 3, 4]
+            case 3:
+                # Malformed JSON
+                return b'{"name": "eggs", "price": '
+    return json.dumps(record).encode('utf-8')
+
+def generate_demo_ndjson(file, size, invalid=0.0, seed=DEFAULT_SEED):
+
+    """ Write newline-delimited demo JSON records of about size bytes to
+        the binary file file.
+
+        invalid gives the share of invalid records (0.0 - 1.0). Returns
+        the number of bytes written.
+
+    """
+    rng = random.Random(seed)
+    records = (demo_record(rng, rng.random() < invalid)
+               for index in range(sys.maxsize))
+    return write_records(file, size, records, separator=b'\n',
+                         footer=b'\n')
+
+### GeoJSON
+
+def geojson_feature(rng, index, invalid=False):
+    feature = {
+        'type': 'Feature',
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [round(rng.uniform(-180, 180), 4),
+                            round(rng.uniform(-90, 90), 4)],
+        },
+        'properties': {
+            'name': f'Place {index}',
+        },
+    }
+    if rng.random() < 0.1:
+        feature['id'] = index
+    if invalid:
+        match rng.randint(0, 2):
+            case 0:
+                # Unknown type
+                feature['type'] = 'Polygonal'
+            case 1:
+                # Missing type
+                del feature['type']
+            case 2:
+                # Not an object
+                feature = [index]
+    return json.dumps(feature).encode('utf-8')
+
+def generate_geojson(file, size, invalid=0.0, seed=DEFAULT_SEED):
+
+    """ Write a GeoJSON FeatureCollection of about size bytes to the
+        binary file file.
+
+        invalid gives the share of invalid features (0.0 - 1.0).
+        Returns the number of bytes written.
+
+    """
+    rng = random.Random(seed)
+    records = (geojson_feature(rng, index, rng.random() < invalid)
+               for index in range(sys.maxsize))
+    return write_records(file, size, records,
+                         header=b'{"type": "FeatureCollection", '
+                                b'"features": [\n',
+                         separator=b',\n',
+                         footer=b'\n]}\n')
+
+### Interface
+
+GENERATORS = {
+    'xml': generate_countries_xml,
+    'json': generate_demo_ndjson,
+    'geojson': generate_geojson,
+}
+
+def generate_file(kind, filename, size, invalid=0.0, seed=DEFAULT_SEED):
+
+    """ Write synthetic data of the given kind (see KINDS) and size to
+        the file filename.
+
+        Returns the number of bytes written.
+
+    """
+    generator = GENERATORS[kind]
+    with open(filename, 'wb') as file:
+        return generator(file, parse_size(size), invalid, seed)
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description='Generate synthetic data for the parser benchmarks')
+    argparser.add_argument(
+        'kind',
+        choices=tuple(KINDS))
+    argparser.add_argument(
+        'size',
+        help='size of the data, e.g. 100KB, 10MB or 1GB')
+    argparser.add_argument(
+        'filename')
+    argparser.add_argument(
+        '--invalid',
+        help='share of invalid records (0.0 - 1.0, default: 0.0)',
+        default=0.0,
+        type=float)
+    argparser.add_argument(
+        '--seed',
+        help=f'random seed (default: {DEFAULT_SEED})',
+        default=DEFAULT_SEED,
+        type=int)
+    args = argparser.parse_args(argv)
+    written = generate_file(args.kind, args.filename, args.size,
+                            args.invalid, args.seed)
+    print (f'wrote {written} bytes to {args.filename}')
+
+###
+
+if __name__ == '__main__':
+    main()